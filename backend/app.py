@@ -4,18 +4,55 @@ Main entry point for the backend API
 """
 
 from flask import Flask, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from functools import lru_cache
+import logging
 import os
 
+try:
+    import orjson  # Faster JSON encoding for large expense lists
+except ImportError:
+    orjson = None
+
 from config import Config
 from database.db_manager import init_db
 from routes.expenses import expenses_bp
 from routes.auth import auth_bp
 
-def create_app():
-    """Create and configure the Flask application"""
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, producing the same output as the default"""
+    
+    def _encode(self, obj, **kwargs) -> bytes:
+        # Datetimes go through self.default so they keep Flask's HTTP-date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+    
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, **kwargs).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Like the default, but hands orjson's bytes straight to the response (no str round-trip)"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def create_app(debug: bool = None):
+    """Create and configure the Flask application (debug overrides Config.DEBUG)"""
     app = Flask(__name__, static_folder='../frontend', static_url_path='')
     app.config.from_object(Config)
+    if debug is not None:
+        app.config['DEBUG'] = debug
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     
     # Enable CORS for frontend
     CORS(app, origins=['http://localhost:5000', 'http://127.0.0.1:5000'])
@@ -33,9 +70,15 @@ def create_app():
     def serve_frontend():
         return send_from_directory(app.static_folder, 'index.html')
     
+    # Remember which request paths are real files so SPA routes and assets
+    # don't cost a stat() on every hit (restart to pick up new files)
+    @lru_cache(maxsize=1024)
+    def is_static_file(path):
+        return os.path.isfile(os.path.join(app.static_folder, path))
+    
     @app.route('/<path:path>')
     def serve_static(path):
-        if os.path.exists(os.path.join(app.static_folder, path)):
+        if is_static_file(path):
             return send_from_directory(app.static_folder, path)
         return send_from_directory(app.static_folder, 'index.html')
     
@@ -44,5 +87,9 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
+    logging.basicConfig(level=logging.INFO)
+    if app.debug:
+        # Show categorizer API request/response logs during development
+        logging.getLogger('categorizer').setLevel(logging.DEBUG)
     print("🚀 Splitwise Analytics running at http://localhost:5000")
     app.run(debug=True, port=5000)
@@ -0,0 +1,24 @@
+"""
+Concurrency limit shared by every categorizer's API calls
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+# Upper bound on in-flight categorization API calls, across all categorizer
+# classes, instances and requests
+MAX_CONCURRENT_REQUESTS = 4
+api_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+
+def map_batches(fn: Callable, batches: List) -> List:
+    """
+    Run fn on each batch concurrently and return the results in batch order.
+    API calls are I/O bound, so batches overlap; fn should hold api_slots
+    around its API call to stay within MAX_CONCURRENT_REQUESTS overall.
+    """
+    if not batches:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(batches), MAX_CONCURRENT_REQUESTS)) as pool:
+        return list(pool.map(fn, batches))
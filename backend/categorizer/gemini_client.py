@@ -4,10 +4,84 @@ Uses Google's Gemini API for smart expense categorization
 Optimized for minimal token usage to stay within quota limits
 """
 
-import google.generativeai as genai
 from typing import List, Dict, Optional
+from functools import lru_cache
+import logging
 import re
 
+from .concurrency import api_slots, map_batches
+
+try:
+    import ahocorasick  # pyahocorasick: multi-keyword matching in one pass
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _genai():
+    """Import google.generativeai on first use; it pulls in grpc and slows app startup"""
+    import google.generativeai as genai
+    return genai
+
+
+def _trie_regex(keywords: List[str]) -> str:
+    """
+    Build a prefix-factored regex from a character trie of keywords,
+    e.g. ['gas', 'gas cylinder'] -> 'gas(?: cylinder)?' (spaces escaped).
+    The regex engine then tests each shared prefix once per position.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of keyword
+    
+    def render(node: Dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        return group + '?' if '' in node else group
+    
+    return render(trie)
+
+
+def _build_keyword_matcher(keyword_categories: Dict[str, List[str]]):
+    """
+    Build the keyword scan behind categorize_local. The returned function
+    gives the lowest matching category index for a description (or None),
+    so categories win in keyword_categories order like a nested loop would.
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for index, keywords in enumerate(keyword_categories.values()):
+            for keyword in keywords:
+                automaton.add_word(keyword, index)
+        automaton.make_automaton()
+        
+        def match(description: str) -> Optional[int]:
+            hits = automaton.iter(description.lower())
+            return min((index for _, index in hits), default=None)
+    else:
+        # Capture group N holds the keywords of category index N - 1; the
+        # zero-width lookahead makes overlapping keywords all reported
+        alternatives = '|'.join(f"({_trie_regex(keywords)})" for keywords in keyword_categories.values())
+        pattern = re.compile(f"(?=(?:{alternatives}))", re.IGNORECASE)
+        # Most descriptions are plain ASCII, where ASCII-only case folding
+        # gives the same matches without the Unicode case tables
+        ascii_pattern = re.compile(f"(?=(?:{alternatives}))", re.IGNORECASE | re.ASCII)
+        
+        def match(description: str) -> Optional[int]:
+            hits = (ascii_pattern if description.isascii() else pattern).finditer(description)
+            return min((hit.lastindex - 1 for hit in hits), default=None)
+    
+    return match
+
 
 class GeminiCategorizer:
     """AI categorizer using Gemini API with token optimization"""
@@ -33,8 +107,13 @@ class GeminiCategorizer:
         'O': 'Other'
     }
     
-    # Reverse mapping
-    CODE_TO_CATEGORY = {v: v for v in CATEGORY_CODES.values()}
+    # "idx:code" pairs in API replies, e.g. "0:F,1:G" or "0:F 1:G"
+    # (case-insensitive, so the reply is never copied just to uppercase it)
+    _RESP_RE = re.compile(r'(\d+)\s*:\s*([FGTDSEURVHBLPWCYO])', re.IGNORECASE)
+    _CATEGORY_CODES_CI = {**{k.lower(): v for k, v in CATEGORY_CODES.items()}, **CATEGORY_CODES}
+    
+    # Common words that add tokens but no meaning to a description
+    _NOISE_WORDS = frozenset(['payment', 'for', 'the', 'at', 'to', 'from', 'and', 'or', 'in', 'on', 'a', 'an'])
     
     # Category keywords for fallback local categorization
     KEYWORD_CATEGORIES = {
@@ -80,6 +159,9 @@ class GeminiCategorizer:
                      'indane', 'bharat gas', 'refill']
     }
     
+    # Category names by index; the keyword matcher reports these indices
+    _category_names = tuple(KEYWORD_CATEGORIES)
+    
     def __init__(self, api_key: str, model: str = 'gemini-2.0-flash'):
         """Initialize Gemini client with API key"""
         self.api_key = api_key
@@ -90,6 +172,7 @@ class GeminiCategorizer:
     def _initialize_client(self):
         """Initialize the Gemini client"""
         if self.api_key:
+            genai = _genai()
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(self.model_name)
     
@@ -97,30 +180,28 @@ class GeminiCategorizer:
         """Check if API key is configured"""
         return bool(self.api_key and self.model)
     
-    def _compact_description(self, description: str) -> str:
-        """Compact description for minimal tokens"""
-        # Remove extra whitespace
-        desc = ' '.join(description.split())
-        # Remove common noise words
-        noise = ['payment', 'for', 'the', 'at', 'to', 'from', 'and', 'or', 'in', 'on', 'a', 'an']
-        words = desc.lower().split()
-        words = [w for w in words if w not in noise and len(w) > 1]
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _compact_description(description: str) -> str:
+        """Compact description for minimal tokens (memoized, descriptions repeat a lot)"""
+        # Split once (also drops extra whitespace) and remove noise words
+        words = [
+            w for w in description.lower().split()
+            if len(w) > 1 and w not in GeminiCategorizer._NOISE_WORDS
+        ]
         # Keep first 5 meaningful words max
         return ' '.join(words[:5])
     
-    def categorize_local(self, description: str) -> Optional[str]:
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def categorize_local(description: str) -> Optional[str]:
         """
         Categorize using local keyword matching (no API call).
         Use this as fallback or to reduce API usage.
+        Memoized per description; the keyword tables are class-level and fixed.
         """
-        desc_lower = description.lower()
-        
-        for category, keywords in self.KEYWORD_CATEGORIES.items():
-            for keyword in keywords:
-                if keyword in desc_lower:
-                    return category
-        
-        return None
+        best = _KEYWORD_MATCHER(description)
+        return GeminiCategorizer._category_names[best] if best is not None else None
     
     def categorize_batch(
         self,
@@ -140,20 +221,22 @@ class GeminiCategorizer:
             List of {'id': ..., 'category': ...}
         """
         results = []
-        to_categorize_api = []
+        to_categorize_api = expenses
         
-        # First pass: try local categorization
-        for expense in expenses:
-            exp_id = expense.get('splitwise_id') or expense.get('id')
-            description = expense.get('description', '')
-            
-            if use_local_fallback:
-                local_category = self.categorize_local(description)
-                if local_category:
-                    results.append({'splitwise_id': exp_id, 'category': local_category})
-                    continue
-            
-            to_categorize_api.append(expense)
+        # First pass: try local categorization. map() over the C-level
+        # lru_cache wrapper keeps repeated descriptions out of the interpreter.
+        if use_local_fallback:
+            local_categories = list(map(
+                self.categorize_local,
+                [expense.get('description', '') for expense in expenses]
+            ))
+            results = [
+                {'splitwise_id': expense.get('splitwise_id') or expense.get('id'), 'category': category}
+                for expense, category in zip(expenses, local_categories) if category
+            ]
+            to_categorize_api = [
+                expense for expense, category in zip(expenses, local_categories) if not category
+            ]
         
         # If no API client or no items left, return
         if not self.is_configured() or not to_categorize_api:
@@ -163,11 +246,21 @@ class GeminiCategorizer:
                 results.append({'splitwise_id': exp_id, 'category': 'Other'})
             return results
         
-        # Second pass: batch API categorization
-        for i in range(0, len(to_categorize_api), batch_size):
-            batch = to_categorize_api[i:i + batch_size]
-            batch_results = self._categorize_with_api(batch)
-            results.extend(batch_results)
+        # Second pass: batch API categorization. Each distinct description is
+        # sent once (ids are positions in id_groups) and fanned out afterwards.
+        ids_by_description: Dict[str, List] = {}
+        for expense in to_categorize_api:
+            ids_by_description.setdefault(expense.get('description', ''), []).append(
+                expense.get('splitwise_id') or expense.get('id')
+            )
+        unique = [{'id': i, 'description': desc} for i, desc in enumerate(ids_by_description)]
+        id_groups = list(ids_by_description.values())
+        
+        batches = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+        for batch_results in map_batches(self._categorize_with_api, batches):
+            for result in batch_results:
+                for exp_id in id_groups[result['splitwise_id']]:
+                    results.append({'splitwise_id': exp_id, 'category': result['category']})
         
         return results
     
@@ -192,56 +285,38 @@ class GeminiCategorizer:
 Reply idx:cat (F=Food,G=Grocery,T=Transport,D=DailyEss,S=Shop,E=Ent,U=Util,R=Rent,V=Travel,H=Health,B=Sub,L=Edu,P=Personal,W=Work,C=Cravings,Y=Cylinder,O=Other)
 Only idx:cat pairs, no explanation"""
         
-        # DEBUG: Log the request
-        print("\n" + "="*60)
-        print("🤖 GEMINI API REQUEST")
-        print("="*60)
-        print(f"Prompt:\n{prompt}")
-        print("="*60)
+        # DEBUG: Log the request (formatted only when DEBUG is enabled)
+        logger.debug("🤖 GEMINI API REQUEST\nPrompt:\n%s", prompt)
         
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    'max_output_tokens': 100,
-                    'temperature': 0.1
-                }
-            )
+            with api_slots:
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config={
+                        'max_output_tokens': 100,
+                        'temperature': 0.1
+                    }
+                )
             
             # DEBUG: Log the response
-            print("\n" + "="*60)
-            print("✅ GEMINI API RESPONSE")
-            print("="*60)
-            print(f"Response: {response.text}")
-            print("="*60 + "\n")
+            logger.debug("✅ GEMINI API RESPONSE\nResponse: %s", response.text)
             
             return self._parse_api_response(response.text, id_map, len(expenses))
             
         except Exception as e:
-            print(f"\n❌ Gemini API error: {e}\n")
+            logger.warning("❌ Gemini API error: %s", e)
             # Return 'Other' for all on error
             return [{'splitwise_id': id_map[i], 'category': 'Other'} for i in range(len(expenses))]
     
     def _parse_api_response(self, response: str, id_map: Dict[int, int], count: int) -> List[Dict]:
         """Parse the compact API response"""
-        results = []
-        
-        # Parse patterns like "0:F" or "0:F,1:G" or "0:F 1:G"
-        pattern = r'(\d+)\s*:\s*([FGTDSEURVHBLPWCYO])'
-        matches = re.findall(pattern, response.upper())
-        
-        found_indices = set()
-        for idx_str, code in matches:
+        # Start everything as 'Other' and overwrite in place. Matches are
+        # applied in reverse so the first pair for an index wins.
+        results = [{'splitwise_id': id_map[i], 'category': 'Other'} for i in range(count)]
+        for idx_str, code in reversed(self._RESP_RE.findall(response)):
             idx = int(idx_str)
-            if idx in id_map and idx not in found_indices:
-                category = self.CATEGORY_CODES.get(code, 'Other')
-                results.append({'splitwise_id': id_map[idx], 'category': category})
-                found_indices.add(idx)
-        
-        # Fill missing with 'Other'
-        for i in range(count):
-            if i not in found_indices and i in id_map:
-                results.append({'splitwise_id': id_map[i], 'category': 'Other'})
+            if idx < count:
+                results[idx]['category'] = self._CATEGORY_CODES_CI.get(code, 'Other')
         
         return results
     
@@ -257,3 +332,7 @@ Only idx:cat pairs, no explanation"""
         # Single item API call (expensive, avoid if possible)
         result = self._categorize_with_api([{'id': 0, 'description': description}])
         return result[0]['category'] if result else 'Other'
+
+
+# Built once at import rather than per GeminiCategorizer instance
+_KEYWORD_MATCHER = _build_keyword_matcher(GeminiCategorizer.KEYWORD_CATEGORIES)
@@ -6,18 +6,33 @@ Categories aligned with Indian household expense patterns
 
 import os
 import re
+import logging
 from typing import List, Dict, Optional
-from pathlib import Path
-from dotenv import load_dotenv
+from .concurrency import api_slots, map_batches
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - lets httpx speak HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 class GroqCategorizer:
     """Pure LLM-based expense categorizer using Groq (free Llama API)"""
     
+    # Retries for rate-limited (429) and transient failures; the SDK backs
+    # off exponentially with jitter and honours Retry-After
+    MAX_RETRIES = 5
+    
+    # Batch packing: descriptions per request trade round-trips against
+    # answer quality (MAX_ITEMS_PER_BATCH is the knob); requests are also
+    # capped by an estimate of their prompt size, at ~4 characters a token
+    MAX_ITEMS_PER_BATCH = 50
+    MAX_PROMPT_TOKENS = 6000
+    RESPONSE_TOKENS_PER_ITEM = 10  # "idx:Category" line
+    
     # Available categories for expense classification - aligned with tested results
     CATEGORIES = [
         'Grocery',           # General grocery shopping, supermarket
@@ -41,35 +56,9 @@ class GroqCategorizer:
         'Other'              # Uncategorized
     ]
     
-    def __init__(self):
-        """Initialize Groq client"""
-        self.api_key = os.environ.get('GROQ_API_KEY')
-        self.client = None
-        self.model = "llama-3.3-70b-versatile"  # Larger, more accurate model
-        
-        if self.api_key:
-            try:
-                from groq import Groq
-                self.client = Groq(api_key=self.api_key)
-                print(f"✅ Groq LLM Categorizer initialized (model: {self.model})")
-            except ImportError:
-                print("❌ Groq package not installed. Run: pip install groq")
-            except Exception as e:
-                print(f"❌ Groq init error: {e}")
-        else:
-            print("❌ GROQ_API_KEY not found in environment")
-    
-    def is_configured(self) -> bool:
-        """Check if Groq is properly configured"""
-        return self.client is not None
-    
-    def _build_prompt(self, descriptions: List[str]) -> str:
-        """Build the categorization prompt optimized for Indian household expenses"""
-        
-        # Build numbered list of expenses
-        expenses_list = "\n".join(f"{i}: {desc}" for i, desc in enumerate(descriptions))
-        
-        prompt = f"""You are an expense categorizer for an Indian household. Categorize each expense into exactly ONE category.
+    # Categories, examples and rules are identical for every request, so they
+    # go in the system message once instead of being rebuilt into each prompt
+    _SYSTEM_PROMPT = """You are an expense categorizer for an Indian household. Categorize each expense into exactly ONE category.
 
 CATEGORIES AND EXAMPLES:
 
@@ -118,12 +107,69 @@ RULES:
 4. Cooked/prepared food = Food & Dining
 5. NEVER use "General" - use the most specific category
 
-Expenses to categorize:
-{expenses_list}
-
-Reply ONLY with: index:category (one per line). NO explanations."""
+Reply ONLY with: index:category (one per line). NO explanations. Never use 'General' as a category."""
+    _SYSTEM_MESSAGE = {"role": "system", "content": _SYSTEM_PROMPT}
+    
+    # Parses lines like "0:Food" or "0: Food" or "0 - Food"
+    _RESULT_PATTERN = re.compile(r'(\d+)\s*[:\-]\s*([A-Za-z &/]+)')
+    
+    def __init__(self):
+        """Initialize Groq client"""
+        self.api_key = os.environ.get('GROQ_API_KEY')
+        self.client = None
+        self.model = "llama-3.3-70b-versatile"  # Larger, more accurate model
+        
+        # Lowercased category names and their words -> category, so most
+        # labels returned by the LLM validate with a single dict lookup
+        labels = {cat.lower() for cat in self.CATEGORIES}
+        labels.update(word for label in list(labels) for word in re.split(r'[ &/]+', label) if word)
+        self._cat_lookup = {label: self._match_category(label) for label in labels}
         
-        return prompt
+        if self.api_key:
+            try:
+                from groq import Groq
+                try:
+                    import httpx
+                    from groq import DefaultHttpxClient  # groq >= 0.6.0
+                except ImportError:
+                    # Older SDK: its own default pool still reuses connections
+                    self.client = Groq(api_key=self.api_key, max_retries=self.MAX_RETRIES)
+                else:
+                    # Concurrent batches share pooled keep-alive connections
+                    # (multiplexed over one when HTTP/2 is available)
+                    http_client = DefaultHttpxClient(
+                        http2=HTTP2_AVAILABLE,
+                        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+                    )
+                    self.client = Groq(api_key=self.api_key, max_retries=self.MAX_RETRIES, http_client=http_client)
+                print(f"✅ Groq LLM Categorizer initialized (model: {self.model})")
+            except ImportError:
+                print("❌ Groq package not installed. Run: pip install groq")
+            except Exception as e:
+                print(f"❌ Groq init error: {e}")
+        else:
+            print("❌ GROQ_API_KEY not found in environment")
+    
+    def is_configured(self) -> bool:
+        """Check if Groq is properly configured"""
+        return self.client is not None
+    
+    @classmethod
+    def _match_category(cls, label: str) -> Optional[str]:
+        """Find the category for a lowercased label (exact or partial match)"""
+        for cat in cls.CATEGORIES:
+            cat_lower = cat.lower()
+            if cat_lower == label or label in cat_lower or cat_lower in label:
+                return cat
+        return None
+    
+    def _build_prompt(self, descriptions: List[str]) -> str:
+        """Build the per-call user message; examples and rules live in _SYSTEM_PROMPT"""
+        
+        # Build numbered list of expenses
+        expenses_list = "\n".join(f"{i}: {desc}" for i, desc in enumerate(descriptions))
+        
+        return f"Categorize:\n{expenses_list}\nReply idx:category"
     
     def categorize_with_llm(self, descriptions: List[str], debug: bool = True) -> Dict:
         """
@@ -140,34 +186,24 @@ Reply ONLY with: index:category (one per line). NO explanations."""
         prompt = self._build_prompt(descriptions)
         
         if debug:
-            print("\n" + "="*70)
-            print("🦙 GROQ LLM REQUEST (Llama 3.1 8B)")
-            print("="*70)
-            print(f"Categorizing {len(descriptions)} expenses...")
-            print("="*70)
+            logger.debug("🦙 GROQ LLM REQUEST (%s): categorizing %d expenses", self.model, len(descriptions))
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expense categorizer. Only reply with id:category pairs, nothing else. Never use 'General' as a category."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.1  # Low temperature for consistent categorization
-            )
+            with api_slots:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        self._SYSTEM_MESSAGE,
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=self.RESPONSE_TOKENS_PER_ITEM * len(descriptions) + 50,
+                    temperature=0.1  # Low temperature for consistent categorization
+                )
             
             response_text = response.choices[0].message.content
             
             if debug:
-                print("\n" + "="*70)
-                print("✅ GROQ LLM RESPONSE")
-                print("="*70)
-                print(f"Raw Response:\n{response_text}")
-                print("="*70 + "\n")
+                logger.debug("✅ GROQ LLM RESPONSE\nRaw Response:\n%s", response_text)
             
             # Parse the response
             results = self._parse_response(response_text, descriptions)
@@ -182,7 +218,7 @@ Reply ONLY with: index:category (one per line). NO explanations."""
         except Exception as e:
             error_msg = str(e)
             if debug:
-                print(f"\n❌ Groq API error: {error_msg}\n")
+                logger.warning("❌ Groq API error: %s", error_msg)
             
             return {
                 'success': False,
@@ -195,28 +231,18 @@ Reply ONLY with: index:category (one per line). NO explanations."""
         results = []
         parsed_indices = set()
         
-        # Parse patterns like "0:Food" or "0: Food" or "0 - Food"
-        pattern = r'(\d+)\s*[:\-]\s*([A-Za-z &/]+)'
-        matches = re.findall(pattern, response)
+        matches = self._RESULT_PATTERN.findall(response)
         
         for idx_str, category in matches:
             idx = int(idx_str)
             category = category.strip()
-            
-            # Validate category - find matching category
-            valid_category = None
-            for cat in self.CATEGORIES:
-                if cat.lower() == category.lower():
-                    valid_category = cat
-                    break
-                # Partial match
-                if category.lower() in cat.lower() or cat.lower() in category.lower():
-                    valid_category = cat
-                    break
+            label = category.lower()
             
             # Map "General" to "Other" if it somehow appears
-            if category.lower() == 'general':
+            if label == 'general':
                 valid_category = 'Other'
+            else:
+                valid_category = self._cat_lookup.get(label) or self._match_category(label)
             
             if valid_category and idx < len(descriptions):
                 results.append({
@@ -240,34 +266,52 @@ Reply ONLY with: index:category (one per line). NO explanations."""
         
         return results
     
-    def categorize_batch(self, expenses: List[Dict], batch_size: int = 20) -> List[Dict]:
-        """Categorize a batch of expenses for database update"""
-        all_results = []
+    def _pack_batches(self, descriptions: List[str], max_items: int) -> List[List[str]]:
+        """Greedily group descriptions into requests within the item and prompt-token budgets"""
+        batches = []
+        batch, batch_tokens = [], 0
+        for desc in descriptions:
+            tokens = len(desc) // 4 + 4  # text plus "idx: " and newline
+            if batch and (len(batch) >= max_items or batch_tokens + tokens > self.MAX_PROMPT_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(desc)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def categorize_batch(self, expenses: List[Dict], batch_size: int = None) -> List[Dict]:
+        """
+        Categorize a batch of expenses for database update. Expenses in
+        batches the API failed on are not in the result.
+        """
+        ids = [e.get('splitwise_id') or e.get('id') for e in expenses]
+        all_results: List[Optional[Dict]] = [None] * len(expenses)
         
-        for i in range(0, len(expenses), batch_size):
-            batch = expenses[i:i + batch_size]
-            descriptions = [e.get('description', '') for e in batch]
-            ids = [e.get('splitwise_id') or e.get('id') for e in batch]
-            
-            response = self.categorize_with_llm(descriptions, debug=True)
-            
+        # Send each distinct description to the LLM once and fan the
+        # category out to every position that shares it
+        positions_by_description: Dict[str, List[int]] = {}
+        for pos, e in enumerate(expenses):
+            positions_by_description.setdefault(e.get('description', ''), []).append(pos)
+        unique_descriptions = list(positions_by_description)
+        
+        batches = self._pack_batches(unique_descriptions, batch_size or self.MAX_ITEMS_PER_BATCH)
+        if not batches:
+            return []
+        
+        responses = map_batches(self.categorize_with_llm, batches)
+        
+        for response in responses:
+            # Failed batches are left out rather than saved as 'Other', so
+            # their expenses stay uncategorized and are retried later
             if response['success']:
                 for result in response['results']:
-                    idx = result['index']
-                    if idx < len(ids):
-                        all_results.append({
-                            'splitwise_id': ids[idx],
-                            'category': result['category']
-                        })
-            else:
-                # On error, assign 'Other' to all in batch
-                for exp_id in ids:
-                    all_results.append({
-                        'splitwise_id': exp_id,
-                        'category': 'Other'
-                    })
+                    category = result['category']
+                    for pos in positions_by_description[result['description']]:
+                        all_results[pos] = {'splitwise_id': ids[pos], 'category': category}
         
-        return all_results
+        return [result for result in all_results if result is not None]
     
     def categorize_single(self, description: str) -> str:
         """Categorize a single expense"""
@@ -6,20 +6,64 @@ No Gemini quota limits - completely local or uses free tier APIs
 
 import re
 import os
-from typing import List, Dict, Optional
-from pathlib import Path
-from dotenv import load_dotenv
+import difflib
+import heapq
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Optional, Set, Tuple
+from .concurrency import api_slots, map_batches
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+try:
+    import ahocorasick  # pyahocorasick: multi-keyword matching in one pass
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2 as _pattern_re  # google-re2: linear-time matching for the pattern unions
+except ImportError:
+    _pattern_re = re
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _get_groq_client(api_key: str):
+    """
+    Create the Groq client once per process and share it between
+    categorizer instances, so the groq/httpx import happens only on first
+    use and connections are reused across calls.
+    """
+    try:
+        from groq import Groq
+        client = Groq(api_key=api_key)
+        logger.info("✅ Groq client initialized (free Llama API)")
+        return client
+    except ImportError:
+        logger.warning("⚠️ Groq not installed. Run: pip install groq")
+    except Exception as e:
+        logger.warning("⚠️ Groq init error: %s", e)
+    return None
+
+
+# Used by SmartCategorizer._normalize on every description
+_RE_NONWORD = re.compile(r'[^\w\s]')
+# ASCII fast path: every ASCII char that _RE_NONWORD would replace
+_ASCII_NONWORD_TABLE = str.maketrans({c: ' ' for c in map(chr, range(128)) if _RE_NONWORD.match(c)})
 
 
 class SmartCategorizer:
     """Smart expense categorizer with local-first approach"""
     
-    # Extended category patterns with regex support
-    CATEGORY_PATTERNS = {
+    # Extended category patterns with regex support (read-only; the matching
+    # tables at the bottom of this module are derived from it at import)
+    CATEGORY_PATTERNS = MappingProxyType({
         'Food': {
             'keywords': [
                 'food', 'lunch', 'dinner', 'breakfast', 'meal', 'eat', 'snack',
@@ -216,23 +260,19 @@ class SmartCategorizer:
             ],
             'patterns': [r'.*late.*night.*snack', r'.*treat.*']
         }
-    }
+    })
     
     def __init__(self, use_groq: bool = True):
         """Initialize categorizer"""
         self.use_groq = use_groq
-        self.groq_client = None
         self.groq_api_key = os.environ.get('GROQ_API_KEY')
-        
-        if self.use_groq and self.groq_api_key:
-            try:
-                from groq import Groq
-                self.groq_client = Groq(api_key=self.groq_api_key)
-                print("✅ Groq client initialized (free Llama API)")
-            except ImportError:
-                print("⚠️ Groq not installed. Run: pip install groq")
-            except Exception as e:
-                print(f"⚠️ Groq init error: {e}")
+    
+    @property
+    def groq_client(self):
+        """Shared Groq client, created on first use (None if unavailable)"""
+        if not (self.use_groq and self.groq_api_key):
+            return None
+        return _get_groq_client(self.groq_api_key)
     
     def is_groq_available(self) -> bool:
         """Check if Groq API is available"""
@@ -240,44 +280,19 @@ class SmartCategorizer:
     
     def _normalize(self, text: str) -> str:
         """Normalize text for matching"""
-        text = text.lower().strip()
-        # Remove special chars but keep spaces
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text
+        text = text.lower()
+        # Remove special chars but keep spaces; str.translate skips the
+        # regex engine for the usual all-ASCII description
+        if text.isascii():
+            text = text.translate(_ASCII_NONWORD_TABLE)
+        else:
+            text = _RE_NONWORD.sub(' ', text)
+        # split() also collapses and trims whitespace
+        return ' '.join(text.split())
     
-    def _local_categorize(self, description: str) -> Optional[str]:
-        """Categorize using local pattern matching"""
-        normalized = self._normalize(description)
-        
-        # Score each category
-        scores = {}
-        for category, data in self.CATEGORY_PATTERNS.items():
-            score = 0
-            
-            # Check keywords (fuzzy matching)
-            # Multi-word keywords get higher score
-            for keyword in data['keywords']:
-                if keyword in normalized:
-                    # Multi-word keywords get bonus (ice cream vs cream)
-                    word_count = len(keyword.split())
-                    score += 2 * word_count  # Multi-word match bonus
-                elif len(keyword) > 3 and any(word.startswith(keyword[:4]) for word in normalized.split()):
-                    score += 1  # Partial match
-            
-            # Check regex patterns
-            for pattern in data.get('patterns', []):
-                if re.search(pattern, normalized):
-                    score += 3  # Pattern match
-            
-            if score > 0:
-                scores[category] = score
-        
-        if scores:
-            # Return highest scoring category
-            return max(scores, key=scores.get)
-        
-        return None
+    def _local_categorize(self, description: str) -> Tuple[Optional[str], int]:
+        """Categorize using local pattern matching; returns (category, score)"""
+        return _categorize_normalized(self._normalize(description))
     
     def _groq_categorize(self, descriptions: List[str]) -> Dict[int, str]:
         """Use Groq (free Llama) for categorization"""
@@ -285,63 +300,50 @@ class SmartCategorizer:
             return {}
         
         categories_list = list(self.CATEGORY_PATTERNS.keys()) + ['Other']
+        expenses_list = '\n'.join(f'{i}: {d}' for i, d in enumerate(descriptions))
         
         prompt = f"""Categorize these expenses into one of: {', '.join(categories_list)}
 
 Expenses:
-{chr(10).join(f'{i}: {d}' for i, d in enumerate(descriptions))}
+{expenses_list}
 
-Reply with ONLY the format "id:category" for each, one per line. Example:
-0:Food
-1:Transport
-2:Grocery"""
+Reply with ONLY a JSON object mapping each id to its category. Example:
+{{"0": "Food", "1": "Transport", "2": "Grocery"}}"""
         
-        print("\n" + "="*60)
-        print("🦙 GROQ (LLAMA) API REQUEST")
-        print("="*60)
-        print(f"Prompt:\n{prompt[:500]}...")
-        print("="*60)
+        # %.500s truncates the prompt only when DEBUG is enabled
+        logger.debug("🦙 GROQ (LLAMA) API REQUEST\nPrompt:\n%.500s...", prompt)
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",  # Free, fast model
-                messages=[
-                    {"role": "system", "content": "You are an expense categorizer. Reply only with id:category pairs."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.1
-            )
+            with api_slots:
+                response = self.groq_client.chat.completions.create(
+                    model="llama-3.1-8b-instant",  # Free, fast model
+                    messages=[
+                        {"role": "system", "content": "You are an expense categorizer. Reply only with a JSON object of id: category."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=300,  # JSON keys and quotes cost more than "id:category" lines
+                    temperature=0.1
+                )
             
             response_text = response.choices[0].message.content
             
-            print("\n" + "="*60)
-            print("✅ GROQ API RESPONSE")
-            print("="*60)
-            print(f"Response: {response_text}")
-            print("="*60 + "\n")
+            logger.debug("✅ GROQ API RESPONSE\nResponse: %s", response_text)
             
-            # Parse response
+            # Parse response: {"0": "Food", "1": "Transport", ...}
             result = {}
-            for line in response_text.strip().split('\n'):
-                match = re.match(r'(\d+)\s*:\s*(.+)', line.strip())
-                if match:
-                    idx = int(match.group(1))
-                    cat = match.group(2).strip()
-                    # Validate category
-                    if cat in categories_list:
-                        result[idx] = cat
-                    else:
-                        # Find closest match
-                        for valid_cat in categories_list:
-                            if valid_cat.lower() in cat.lower() or cat.lower() in valid_cat.lower():
-                                result[idx] = valid_cat
-                                break
+            for idx, cat in _json_loads(response_text).items():
+                if not (idx.isdigit() and isinstance(cat, str)):
+                    continue
+                # Validate category
+                valid_cat = _canonical_category(cat.strip())
+                if valid_cat:
+                    result[int(idx)] = valid_cat
             
             return result
             
         except Exception as e:
-            print(f"\n❌ Groq API error: {e}\n")
+            logger.warning("❌ Groq API error: %s", e)
             return {}
     
     def categorize_batch(self, expenses: List[Dict], batch_size: int = 15) -> List[Dict]:
@@ -349,26 +351,32 @@ Reply with ONLY the format "id:category" for each, one per line. Example:
         results = []
         to_categorize_api = []
         
-        # First pass: local categorization
+        # First pass: local categorization, scoring each distinct description once
+        local_categories = {}
         for expense in expenses:
             exp_id = expense.get('splitwise_id') or expense.get('id')
             description = expense.get('description', '')
             
-            category = self._local_categorize(description)
+            if description not in local_categories:
+                local_categories[description] = self._local_categorize(description)
+            category, score = local_categories[description]
             
-            if category:
+            # Any local match is kept; only descriptions with no keyword,
+            # prefix or pattern hit at all are worth an API call
+            if score:
                 results.append({'splitwise_id': exp_id, 'category': category})
             else:
                 to_categorize_api.append((exp_id, description))
         
         # Second pass: API categorization for unknowns
         if to_categorize_api and self.is_groq_available():
-            for i in range(0, len(to_categorize_api), batch_size):
-                batch = to_categorize_api[i:i + batch_size]
-                descriptions = [d for _, d in batch]
-                
-                api_results = self._groq_categorize(descriptions)
-                
+            batches = [to_categorize_api[i:i + batch_size] for i in range(0, len(to_categorize_api), batch_size)]
+            
+            batch_results = map_batches(
+                self._groq_categorize, [[d for _, d in batch] for batch in batches]
+            )
+            
+            for batch, api_results in zip(batches, batch_results):
                 for batch_idx, (exp_id, _) in enumerate(batch):
                     category = api_results.get(batch_idx, 'Other')
                     results.append({'splitwise_id': exp_id, 'category': category})
@@ -381,5 +389,147 @@ Reply with ONLY the format "id:category" for each, one per line. Example:
     
     def categorize_single(self, description: str) -> str:
         """Categorize a single expense"""
-        category = self._local_categorize(description)
+        category, _ = self._local_categorize(description)
         return category or 'Other'
+
+
+def _build_pattern_table(category_patterns: Dict[str, Dict]) -> tuple:
+    """
+    ((cat_id, pattern), ...) with each category's regex patterns fused into
+    one alternation. Leading and trailing '.*' are dropped since search()
+    already matches anywhere.
+    """
+    table = []
+    for cat_id, data in enumerate(category_patterns.values()):
+        patterns = [p.removeprefix('.*').removesuffix('.*') for p in data.get('patterns', [])]
+        if patterns:
+            table.append((cat_id, _pattern_re.compile('|'.join(f'(?:{p})' for p in patterns))))
+    return tuple(table)
+
+
+def _build_keyword_automaton(keywords: tuple):
+    """Build an Aho-Corasick automaton mapping each keyword to its length"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, (keyword, len(keyword)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_keyword_table(category_patterns: Dict[str, Dict]) -> Dict[str, tuple]:
+    """
+    Flatten the keywords to keyword -> ((cat_id, points), ...). A full match
+    scores 2 points per word (ice cream beats cream).
+    """
+    table = defaultdict(list)
+    for cat_id, data in enumerate(category_patterns.values()):
+        for keyword in data['keywords']:
+            table[keyword].append((cat_id, 2 * len(keyword.split())))
+    return {keyword: tuple(entries) for keyword, entries in table.items()}
+
+
+def _build_prefix_map(category_patterns: Dict[str, Dict]) -> Dict[str, tuple]:
+    """Map the 4-letter prefix of each keyword longer than 3 chars to its keywords"""
+    prefix_map = defaultdict(set)
+    for data in category_patterns.values():
+        for keyword in data['keywords']:
+            # A prefix containing a space can never start a single word
+            if len(keyword) > 3 and ' ' not in keyword[:4]:
+                prefix_map[keyword[:4]].add(keyword)
+    return {prefix: tuple(keywords) for prefix, keywords in prefix_map.items()}
+
+
+# Matchers derived from CATEGORY_PATTERNS, built once per process at import.
+# Categories are referred to by id: their position in CATEGORY_PATTERNS.
+_CATEGORY_NAMES = tuple(SmartCategorizer.CATEGORY_PATTERNS)
+_ALL_KEYWORDS = tuple(dict.fromkeys(
+    keyword for data in SmartCategorizer.CATEGORY_PATTERNS.values() for keyword in data['keywords']
+))
+_SINGLE_WORD_KEYWORDS = frozenset(keyword for keyword in _ALL_KEYWORDS if ' ' not in keyword)
+_MULTI_WORD_KEYWORDS = tuple(keyword for keyword in _ALL_KEYWORDS if ' ' in keyword)
+_KW_TABLE = _build_keyword_table(SmartCategorizer.CATEGORY_PATTERNS)
+_KEYWORD_AUTOMATON = _build_keyword_automaton(_ALL_KEYWORDS)
+_PATTERN_TABLE = _build_pattern_table(SmartCategorizer.CATEGORY_PATTERNS)
+_PREFIX_MAP = _build_prefix_map(SmartCategorizer.CATEGORY_PATTERNS)
+
+# Lowercased category name -> category, for validating LLM replies
+_LOWER_CATEGORIES = {category.lower(): category for category in _CATEGORY_NAMES + ('Other',)}
+
+
+def _canonical_category(label: str) -> Optional[str]:
+    """Map a category label from the LLM to a known category, if any"""
+    lower = label.lower()
+    category = _LOWER_CATEGORIES.get(lower)
+    if category:
+        return category
+    
+    # Either name contained in the other, e.g. "Food & Dining" -> Food
+    for valid_lower, valid_cat in _LOWER_CATEGORIES.items():
+        if valid_lower in lower or lower in valid_lower:
+            return valid_cat
+    
+    # Misspellings, e.g. "Groceries" -> Grocery
+    close = difflib.get_close_matches(lower, _LOWER_CATEGORIES, n=1, cutoff=0.6)
+    return _LOWER_CATEGORIES[close[0]] if close else None
+
+
+def _find_keywords(normalized: str) -> Set[str]:
+    """Return the keywords that occur as whole words in normalized text"""
+    if _KEYWORD_AUTOMATON is None:
+        # Single-word keywords are a set intersection with the words;
+        # only the few multi-word ones need a substring test
+        padded = f' {normalized} '
+        found = set(normalized.split())
+        found &= _SINGLE_WORD_KEYWORDS
+        found.update(keyword for keyword in _MULTI_WORD_KEYWORDS if f' {keyword} ' in padded)
+        return found
+    
+    # One linear pass over the text; hits inside longer words
+    # ("more" in "moreover") are dropped by the boundary check
+    found = set()
+    last = len(normalized) - 1
+    for end, (keyword, length) in _KEYWORD_AUTOMATON.iter(normalized):
+        start = end - length + 1
+        if (start == 0 or normalized[start - 1] == ' ') and (end == last or normalized[end + 1] == ' '):
+            found.add(keyword)
+    return found
+
+
+@lru_cache(maxsize=4096)
+def _categorize_normalized(normalized: str) -> Tuple[Optional[str], int]:
+    """
+    Score normalized text against CATEGORY_PATTERNS, returning the best
+    (category, score). Pure and memoized:
+    expense descriptions repeat a lot ("Swiggy order", "Uber ride").
+    """
+    found = _find_keywords(normalized)
+    # Keywords whose first four letters start some word (partial matches)
+    partial = {
+        keyword
+        for prefix in {word[:4] for word in normalized.split()}
+        for keyword in _PREFIX_MAP.get(prefix, ())
+    }
+    
+    # Score each category; only the keywords that hit are visited
+    scores = [0] * len(_CATEGORY_NAMES)
+    for keyword in found:
+        for cat_id, points in _KW_TABLE[keyword]:
+            scores[cat_id] += points  # Whole-word match
+    for keyword in partial - found:
+        for cat_id, _ in _KW_TABLE[keyword]:
+            scores[cat_id] += 1  # Partial match
+    
+    # Check regex patterns (one precompiled union per category). A pattern
+    # adds at most 3 to any category, so once the leader is ahead of the
+    # runner-up by more than that the result can't change.
+    first, second = heapq.nlargest(2, scores)
+    if first - second <= 3:
+        for cat_id, pattern in _PATTERN_TABLE:
+            if pattern.search(normalized):
+                scores[cat_id] += 3  # Pattern match
+    
+    # Highest scoring category; max() keeps the earliest one on ties
+    best = max(range(len(scores)), key=scores.__getitem__)
+    return (_CATEGORY_NAMES[best] if scores[best] else None), scores[best]
@@ -5,16 +5,30 @@ Handles SQLite operations for expenses and sync metadata
 
 import sqlite3
 import os
+import hashlib
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Optional, Any, Iterable, Iterator
 from flask import current_app, g
 
 
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply per-connection tuning PRAGMAs (WAL itself is set once in init_db)"""
+    conn.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, fsync only at checkpoints
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+    conn.execute('PRAGMA mmap_size=268435456')  # 256 MB memory-mapped reads
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+
 def get_db() -> sqlite3.Connection:
     """Get database connection for current request"""
     if 'db' not in g:
         db_path = current_app.config.get('DATABASE_PATH', 'splitwise_data.db')
-        g.db = sqlite3.connect(db_path)
+        g.db = _configure(sqlite3.connect(db_path))
         g.db.row_factory = sqlite3.Row
     return g.db
 
@@ -26,12 +40,28 @@ def close_db(e=None):
         db.close()
 
 
+# Folds the category variants the analytics group together. Backs the
+# normalized_category generated column so the fold is indexed instead of
+# being re-evaluated per row on every breakdown query.
+_NORMALIZED_CATEGORY_EXPR = '''
+    CASE
+        WHEN COALESCE(ai_category, category) IN ('Groceries', 'Grocery') THEN 'Grocery'
+        WHEN COALESCE(ai_category, category) = 'Dining out' THEN 'Food'
+        ELSE COALESCE(ai_category, category, 'Uncategorized')
+    END
+'''
+
+
 def init_db():
     """Initialize database tables"""
     db_path = current_app.config.get('DATABASE_PATH', 'splitwise_data.db')
-    conn = sqlite3.connect(db_path)
+    conn = _configure(sqlite3.connect(db_path))
     cursor = conn.cursor()
     
+    # Write-ahead logging lets readers run while a sync is writing; the
+    # mode is stored in the database file, so setting it once is enough
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Create expenses table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS expenses (
@@ -52,9 +82,19 @@ def init_db():
             payer_name TEXT,
             user_share REAL NOT NULL,
             is_payment INTEGER DEFAULT 0,
-            synced_at TEXT NOT NULL
+            synced_at TEXT NOT NULL,
+            normalized_category TEXT AS (%s) VIRTUAL
+        )
+    ''' % _NORMALIZED_CATEGORY_EXPR)
+    
+    # Databases created before normalized_category existed get it added
+    # in place; a VIRTUAL column costs nothing to add
+    columns = {row[1] for row in cursor.execute('PRAGMA table_xinfo(expenses)')}
+    if 'normalized_category' not in columns:
+        cursor.execute(
+            'ALTER TABLE expenses ADD COLUMN normalized_category TEXT AS (%s) VIRTUAL'
+            % _NORMALIZED_CATEGORY_EXPR
         )
-    ''')
     
     # Create sync metadata table
     cursor.execute('''
@@ -62,19 +102,65 @@ def init_db():
             id INTEGER PRIMARY KEY,
             last_sync_timestamp TEXT,
             last_updated_expense_date TEXT,
-            total_expenses_synced INTEGER DEFAULT 0
+            total_expenses_synced INTEGER DEFAULT 0,
+            last_updated_at TEXT
         )
     ''')
     
-    # Create categories table for AI categorization cache
+    # last_updated_at is the updated_after cursor for incremental syncs
+    meta_columns = {row[1] for row in cursor.execute('PRAGMA table_info(sync_meta)')}
+    if 'last_updated_at' not in meta_columns:
+        cursor.execute('ALTER TABLE sync_meta ADD COLUMN last_updated_at TEXT')
+    
+    # Create categories table for AI categorization cache, keyed directly
+    # by the 16-byte digest of the normalized description
+    cache_columns = {row[1] for row in cursor.execute('PRAGMA table_info(category_cache)')}
+    if 'id' in cache_columns:
+        # Old layout (rowid + UNIQUE hex MD5): move the rows over, re-keyed
+        cursor.execute('ALTER TABLE category_cache RENAME TO category_cache_old')
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS category_cache (
-            id INTEGER PRIMARY KEY,
-            description_hash TEXT UNIQUE NOT NULL,
+            description_hash BLOB PRIMARY KEY,
             description TEXT NOT NULL,
             category TEXT NOT NULL,
             created_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    if 'id' in cache_columns:
+        cursor.executemany(
+            'INSERT OR REPLACE INTO category_cache VALUES (?, ?, ?, ?)',
+            [
+                (_description_hash(_description_key(row[0])), row[0], row[1], row[2])
+                for row in cursor.execute('''
+                    SELECT description, category, created_at
+                    FROM category_cache_old
+                ''').fetchall()
+            ]
         )
+        cursor.execute('DROP TABLE category_cache_old')
+    
+    # Indexes for the hot filters. The partial ones only cover active
+    # (not deleted, not payment) rows, which is all the analytics read.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_exp_active_date ON expenses(date DESC)
+        WHERE deleted_at IS NULL AND is_payment = 0
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_exp_ai_cat ON expenses(ai_category)
+        WHERE deleted_at IS NULL AND is_payment = 0
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_exp_norm_cat ON expenses(normalized_category)
+        WHERE deleted_at IS NULL AND is_payment = 0
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_exp_group ON expenses(group_id)')
+    # Covers get_uncategorized_expenses entirely (id is the rowid), so
+    # that query never touches the table; supersedes idx_exp_uncat
+    cursor.execute('DROP INDEX IF EXISTS idx_exp_uncat')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_exp_uncat_cover
+        ON expenses(date, id, splitwise_id, description)
+        WHERE ai_category IS NULL AND deleted_at IS NULL AND is_payment = 0
     ''')
     
     # Insert initial sync meta if not exists
@@ -88,8 +174,168 @@ def init_db():
     conn.commit()
     conn.close()
     
-    # Register close_db with app
-    current_app.teardown_appcontext(close_db)
+    # Register close_db with app, once; init_db may run again on the same app
+    if not current_app.extensions.get('db_teardown_registered'):
+        current_app.teardown_appcontext(close_db)
+        current_app.extensions['db_teardown_registered'] = True
+
+
+def _date_range(year: str, month: str = None) -> tuple:
+    """
+    Half-open [start, end) bounds on the ISO date column for a year, or for
+    a month of that year. Unlike strftime() on the column, a range lets
+    SQLite use the date indexes. An invalid year or month (these come
+    straight from query strings) gives a range that matches no rows.
+    """
+    try:
+        year = int(year)
+        month = int(month) if month else None
+    except (TypeError, ValueError):
+        return _EMPTY_RANGE
+    if not 1 <= year <= 9998 or (month is not None and not 1 <= month <= 12):
+        return _EMPTY_RANGE
+    if month:
+        return f'{year:04d}-{month:02d}-01', f'{year + month // 12:04d}-{month % 12 + 1:02d}-01'
+    return f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+
+
+# date >= '' AND date < '' holds for no row
+_EMPTY_RANGE = ('', '')
+
+
+# Rows written per transaction by the bulk writers
+WRITE_BATCH_SIZE = 1000
+
+# IDs bound per "IN (?, ...)" lookup; SQLite builds before 3.32 allow at
+# most 999 bound parameters per statement
+_IN_CHUNK_SIZE = 900
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most size items"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Stored expense columns, in table order. Reads select from this list
+# (or a caller-chosen subset of it) rather than SELECT *.
+EXPENSE_COLUMNS = (
+    'id', 'splitwise_id', 'description', 'amount', 'currency', 'date',
+    'created_at', 'updated_at', 'deleted_at', 'group_id', 'group_name',
+    'category', 'ai_category', 'payer_id', 'payer_name', 'user_share',
+    'is_payment', 'synced_at'
+)
+
+
+# Fixed statements for the hot paths. sqlite3 keeps a per-connection
+# cache of prepared statements keyed by SQL text, so with long-lived
+# connections these are parsed once per thread, not once per call.
+
+_UPSERT_EXPENSE_SQL = '''
+    INSERT INTO expenses (
+        splitwise_id, description, amount, currency, date,
+        created_at, updated_at, deleted_at, group_id, group_name,
+        category, payer_id, payer_name, user_share, is_payment, synced_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(splitwise_id) DO UPDATE SET
+        description = excluded.description,
+        amount = excluded.amount,
+        currency = excluded.currency,
+        date = excluded.date,
+        updated_at = excluded.updated_at,
+        deleted_at = excluded.deleted_at,
+        group_id = excluded.group_id,
+        group_name = excluded.group_name,
+        category = excluded.category,
+        payer_id = excluded.payer_id,
+        payer_name = excluded.payer_name,
+        user_share = excluded.user_share,
+        is_payment = excluded.is_payment,
+        synced_at = excluded.synced_at
+    -- Splitwise bumps updated_at on every edit; unchanged rows are not rewritten
+    WHERE expenses.updated_at IS NOT excluded.updated_at
+        OR expenses.deleted_at IS NOT excluded.deleted_at
+'''
+
+_UPDATE_AI_CATEGORY_SQL = '''
+    UPDATE expenses SET ai_category = ?
+    WHERE splitwise_id = ? AND ai_category IS NOT ?
+'''
+
+_YEARLY_ANALYTICS_SQL = '''
+    SELECT 
+        strftime('%Y', date) as year,
+        SUM(user_share) as total,
+        COUNT(*) as count
+    FROM expenses
+    WHERE deleted_at IS NULL AND is_payment = 0
+    GROUP BY year
+    ORDER BY year DESC
+'''
+
+_SYNC_STATUS_SQL = '''
+    SELECT m.*,
+        (SELECT COUNT(*) FROM expenses WHERE deleted_at IS NULL) as expense_count
+    FROM sync_meta m
+    WHERE m.id = 1
+'''
+
+_TOTAL_AND_COUNT_SQL = '''
+    SELECT COALESCE(SUM(user_share), 0), COUNT(*)
+    FROM expenses
+    WHERE deleted_at IS NULL AND is_payment = 0
+'''
+
+_CACHED_CATEGORY_SQL = 'SELECT category FROM category_cache WHERE description_hash = ?'
+
+# Upsert in place; OR REPLACE would delete and re-insert the row
+_CACHE_CATEGORY_SQL = '''
+    INSERT INTO category_cache (description_hash, description, category, created_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(description_hash) DO UPDATE SET
+        description = excluded.description,
+        category = excluded.category,
+        created_at = excluded.created_at
+'''
+
+
+# Per-thread connections, keyed by database path, reused across calls
+_local = threading.local()
+
+
+def _description_key(description: str) -> str:
+    """Normalized form of a description used as the category cache key"""
+    return description.lower().strip()
+
+
+@lru_cache(maxsize=4096)
+def _description_hash(desc_norm: str) -> bytes:
+    """
+    16-byte BLAKE2b digest of a normalized description (category_cache key).
+    Memoized separately from the lookups so clearing those on a write
+    does not mean hashing every description again.
+    """
+    return hashlib.blake2b(desc_norm.encode(), digest_size=16).digest()
+
+
+@lru_cache(maxsize=4096)
+def _get_cached_category(db_path: str, desc_norm: str) -> Optional[str]:
+    """
+    Category cache lookup by normalized description. Descriptions repeat
+    a lot across expenses, so hits skip the hashing and the query;
+    DatabaseManager.cache_category clears this on every write.
+    """
+    desc_hash = _description_hash(desc_norm)
+    
+    conn = DatabaseManager(db_path)._get_connection()
+    cursor = conn.cursor()
+    cursor.execute(_CACHED_CATEGORY_SQL, (desc_hash,))
+    row = cursor.fetchone()
+    return row['category'] if row else None
 
 
 class DatabaseManager:
@@ -99,9 +345,18 @@ class DatabaseManager:
         self.db_path = db_path or 'splitwise_data.db'
     
     def _get_connection(self) -> sqlite3.Connection:
-        """Get a new database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """
+        Get this thread's connection to the database, opening it on first
+        use. Connections stay open; writes commit via `with conn:`.
+        """
+        connections = getattr(_local, 'connections', None)
+        if connections is None:
+            connections = _local.connections = {}
+        conn = connections.get(self.db_path)
+        if conn is None:
+            conn = _configure(sqlite3.connect(self.db_path))
+            conn.row_factory = sqlite3.Row
+            connections[self.db_path] = conn
         return conn
     
     def get_existing_expense_ids(self) -> set:
@@ -110,102 +365,95 @@ class DatabaseManager:
         cursor = conn.cursor()
         cursor.execute('SELECT splitwise_id FROM expenses')
         ids = {row['splitwise_id'] for row in cursor.fetchall()}
-        conn.close()
         return ids
     
-    def insert_expenses(self, expenses: List[Dict]) -> int:
-        """Bulk insert expenses, skip duplicates"""
+    def get_expense_count(self) -> int:
+        """Get the number of stored expenses (including deleted and payments)"""
+        conn = self._get_connection()
+        return conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+    
+    def insert_expenses(self, expenses: List) -> int:
+        """
+        Bulk insert expenses; existing ones are refreshed and undeleted.
+        Expenses are dicts, or tuples already in insert column order
+        (splitwise_api.client.ExpenseRow), which are bound as-is.
+        """
         if not expenses:
             return 0
         
+        now = datetime.now().isoformat()
+        rows = (
+            (*expense, now) if isinstance(expense, tuple) else (
+                expense['splitwise_id'],
+                expense['description'],
+                expense['amount'],
+                expense.get('currency', 'INR'),
+                expense['date'],
+                expense['created_at'],
+                expense.get('updated_at'),
+                expense.get('deleted_at'),
+                expense.get('group_id'),
+                expense.get('group_name'),
+                expense.get('category'),
+                expense.get('payer_id'),
+                expense.get('payer_name'),
+                expense['user_share'],
+                expense.get('is_payment', 0),
+                now
+            )
+            for expense in expenses
+        )
+        
         conn = self._get_connection()
         cursor = conn.cursor()
-        
         inserted = 0
-        for expense in expenses:
-            try:
-                cursor.execute('''
-                    INSERT INTO expenses (
-                        splitwise_id, description, amount, currency, date,
-                        created_at, updated_at, deleted_at, group_id, group_name,
-                        category, payer_id, payer_name, user_share, is_payment, synced_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    expense['splitwise_id'],
-                    expense['description'],
-                    expense['amount'],
-                    expense.get('currency', 'INR'),
-                    expense['date'],
-                    expense['created_at'],
-                    expense.get('updated_at'),
-                    expense.get('deleted_at'),
-                    expense.get('group_id'),
-                    expense.get('group_name'),
-                    expense.get('category'),
-                    expense.get('payer_id'),
-                    expense.get('payer_name'),
-                    expense['user_share'],
-                    expense.get('is_payment', 0),
-                    datetime.now().isoformat()
-                ))
-                if cursor.rowcount > 0:
-                    inserted += 1
-            except sqlite3.IntegrityError:
-                # If we are here, it means ID exists. 
-                # Since we want to support re-sync (undelete), we should update deleted_at = NULL if needed
-                # But simple INSERT failed. Let's do an UPDATE if it exists
-                cursor.execute('''
-                    UPDATE expenses SET 
-                        deleted_at = NULL,
-                        updated_at = ?,
-                        description = ?,
-                        amount = ?,
-                        date = ?,
-                        user_share = ?
-                    WHERE splitwise_id = ?
-                ''', (
-                    datetime.now().isoformat(),
-                    expense['description'],
-                    expense['amount'],
-                    expense['date'],
-                    expense['user_share'],
-                    expense['splitwise_id']
-                ))
-                # Count as inserted/updated? technically updated.
-                continue
+        # Commit every WRITE_BATCH_SIZE rows so a huge initial sync does
+        # not grow a single transaction (and the WAL) without bound
+        for chunk in _chunks(rows, WRITE_BATCH_SIZE):
+            # New rows are the chunk's IDs not stored yet: an indexed lookup
+            # of the chunk, not a count of the whole table
+            ids = {row[0] for row in chunk}
+            with conn:
+                inserted += len(ids)
+                for id_chunk in _chunks(ids, _IN_CHUNK_SIZE):
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM expenses WHERE splitwise_id IN ({', '.join('?' * len(id_chunk))})",
+                        id_chunk
+                    )
+                    inserted -= cursor.fetchone()[0]
+                
+                # One upsert per chunk. An existing ID means a re-sync,
+                # so refresh the row and clear deleted_at (undelete).
+                cursor.executemany(_UPSERT_EXPENSE_SQL, chunk)
         
-        conn.commit()
-        conn.close()
         return inserted
     
-    def update_expense_category(self, splitwise_id: int, category: str):
-        """Update AI category for an expense"""
+    def update_expense_category_by_splitwise_id(self, splitwise_id: int, category: str):
+        """Update AI category for an expense (by Splitwise ID)"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE expenses SET ai_category = ? WHERE splitwise_id = ?
-        ''', (category, splitwise_id))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute('''
+                UPDATE expenses SET ai_category = ? WHERE splitwise_id = ?
+            ''', (category, splitwise_id))
     
     def bulk_update_categories(self, updates: List[Dict]):
         """Bulk update AI categories"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        for update in updates:
-            cursor.execute('''
-                UPDATE expenses SET ai_category = ? WHERE splitwise_id = ?
-            ''', (update['category'], update['splitwise_id']))
-        conn.commit()
-        conn.close()
+        # Rows already holding the category are matched but not rewritten
+        rows = ((update['category'], update['splitwise_id'], update['category']) for update in updates)
+        for chunk in _chunks(rows, WRITE_BATCH_SIZE):
+            with conn:
+                conn.executemany(_UPDATE_AI_CATEGORY_SQL, chunk)
     
     def get_uncategorized_expenses(self, filters: Dict = None) -> List[Dict]:
         """Get expenses without AI category, optional filters"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # Pinned to the covering index: left alone the planner favours the
+        # ai_category index and then visits the table for every row
         query = '''
-            SELECT id, splitwise_id, description FROM expenses
+            SELECT id, splitwise_id, description FROM expenses INDEXED BY idx_exp_uncat_cover
             WHERE ai_category IS NULL AND deleted_at IS NULL AND is_payment = 0
         '''
         params = []
@@ -218,24 +466,54 @@ class DatabaseManager:
                 query += ' AND date <= ?'
                 params.append(filters['end_date'])
             if filters.get('year'):
-                query += " AND strftime('%Y', date) = ?"
-                params.append(filters['year'])
-            if filters.get('month'):
+                query += ' AND date >= ? AND date < ?'
+                params.extend(_date_range(filters['year'], filters.get('month')))
+            elif filters.get('month'):
                 query += " AND strftime('%m', date) = ?"
                 params.append(filters['month'])
                 
         cursor.execute(query, params)
         expenses = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return expenses
     
-    def get_all_expenses(self, filters: Dict = None) -> List[Dict]:
+    def get_uncategorized_expenses_by_ids(self, splitwise_ids: List[int]) -> List[Dict]:
+        """Get the expenses among splitwise_ids that still need an AI category"""
+        conn = self._get_connection()
+        expenses = []
+        # Chunked to _IN_CHUNK_SIZE IDs: older SQLite builds allow only 999
+        # bound parameters per statement
+        for chunk in _chunks(splitwise_ids, _IN_CHUNK_SIZE):
+            cursor = conn.execute(f'''
+                SELECT splitwise_id, description FROM expenses
+                WHERE splitwise_id IN ({', '.join('?' * len(chunk))})
+                    AND ai_category IS NULL AND deleted_at IS NULL AND is_payment = 0
+            ''', chunk)
+            expenses.extend(dict(row) for row in cursor)
+        return expenses
+    
+    def get_all_expenses(self, filters: Dict = None, fields: tuple = None) -> List[Dict]:
         """Get all expenses with optional filters"""
+        return list(self.iter_expenses(filters, fields))
+    
+    def iter_expenses(self, filters: Dict = None, fields: tuple = None) -> Iterator[Dict]:
+        """
+        Yield expenses one at a time, newest first. Takes the same filters
+        as get_all_expenses plus int 'limit'/'offset' for paging, so callers
+        that only need a page never materialize the whole table.
+        
+        fields restricts the returned columns to a subset of EXPENSE_COLUMNS
+        (default: all of them).
+        """
+        fields = fields or EXPENSE_COLUMNS
+        unknown = set(fields).difference(EXPENSE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown expense fields: {', '.join(sorted(unknown))}")
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        query = '''
-            SELECT * FROM expenses
+        query = f'''
+            SELECT {', '.join(fields)} FROM expenses
             WHERE deleted_at IS NULL AND is_payment = 0
         '''
         params = []
@@ -256,10 +534,13 @@ class DatabaseManager:
         
         query += ' ORDER BY date DESC'
         
+        if filters and (filters.get('limit') or filters.get('offset')):
+            query += ' LIMIT ? OFFSET ?'
+            params.extend([filters.get('limit') or -1, filters.get('offset') or 0])
+        
         cursor.execute(query, params)
-        expenses = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return expenses
+        for row in cursor:
+            yield dict(row)
     
     def get_monthly_analytics(self, year: str = None) -> List[Dict]:
         """Get monthly expense breakdown"""
@@ -277,32 +558,21 @@ class DatabaseManager:
         params = []
         
         if year:
-            query += " AND strftime('%Y', date) = ?"
-            params.append(year)
+            query += ' AND date >= ? AND date < ?'
+            params.extend(_date_range(year))
         
         query += ' GROUP BY month ORDER BY month DESC'
         
         cursor.execute(query, params)
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return results
     
     def get_yearly_analytics(self) -> List[Dict]:
         """Get yearly expense breakdown"""
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT 
-                strftime('%Y', date) as year,
-                SUM(user_share) as total,
-                COUNT(*) as count
-            FROM expenses
-            WHERE deleted_at IS NULL AND is_payment = 0
-            GROUP BY year
-            ORDER BY year DESC
-        ''')
+        cursor.execute(_YEARLY_ANALYTICS_SQL)
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return results
     
     def get_category_breakdown(self, year: str = None, month: str = None) -> List[Dict]:
@@ -312,11 +582,7 @@ class DatabaseManager:
         
         query = '''
             SELECT 
-                CASE 
-                    WHEN COALESCE(ai_category, category) IN ('Groceries', 'Grocery') THEN 'Grocery'
-                    WHEN COALESCE(ai_category, category) = 'Dining out' THEN 'Food'
-                    ELSE COALESCE(ai_category, category, 'Uncategorized')
-                END as category_name,
+                normalized_category as category_name,
                 SUM(user_share) as total,
                 COUNT(*) as count
             FROM expenses
@@ -325,9 +591,9 @@ class DatabaseManager:
         params = []
         
         if year:
-            query += " AND strftime('%Y', date) = ?"
-            params.append(year)
-        if month:
+            query += ' AND date >= ? AND date < ?'
+            params.extend(_date_range(year, month))
+        elif month:
             query += " AND strftime('%m', date) = ?"
             params.append(month)
             
@@ -340,91 +606,99 @@ class DatabaseManager:
             res['category'] = res['category_name'] # Map back for frontend
             del res['category_name']
             results.append(res)
-            
-        conn.close()
+        
         return results
     
-    def update_sync_meta(self, last_expense_date: str = None, count: int = 0):
+    def get_total_and_count(self) -> tuple:
+        """Get (total user share, expense count) over active, non-payment expenses"""
+        conn = self._get_connection()
+        return tuple(conn.execute(_TOTAL_AND_COUNT_SQL).fetchone())
+    
+    def get_dashboard_bundle(self) -> Dict:
+        """
+        Get everything the dashboard shows: analytics, totals, the 10 most
+        recent expenses and sync status. Runs as one read transaction so all
+        parts come from the same snapshot, with totals computed in SQL.
+        """
+        conn = self._get_connection()
+        conn.execute('BEGIN')
+        try:
+            total_expenses, expense_count = self.get_total_and_count()
+            return {
+                'total_expenses': total_expenses,
+                'expense_count': expense_count,
+                'monthly': self.get_monthly_analytics(),
+                'yearly': self.get_yearly_analytics(),
+                'categories': self.get_category_breakdown(),
+                'recent_expenses': self.get_all_expenses({'limit': 10}),
+                'sync_status': self.get_sync_status()
+            }
+        finally:
+            conn.commit()  # ends the read transaction
+    
+    def update_sync_meta(self, last_expense_date: str = None, count: int = 0, last_updated_at: str = None):
         """Update sync metadata"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE sync_meta SET
-                last_sync_timestamp = ?,
-                last_updated_expense_date = COALESCE(?, last_updated_expense_date),
-                total_expenses_synced = total_expenses_synced + ?
-            WHERE id = 1
-        ''', (datetime.now().isoformat(), last_expense_date, count))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute('''
+                UPDATE sync_meta SET
+                    last_sync_timestamp = ?,
+                    last_updated_expense_date = COALESCE(?, last_updated_expense_date),
+                    total_expenses_synced = total_expenses_synced + ?,
+                    last_updated_at = COALESCE(?, last_updated_at)
+                WHERE id = 1
+            ''', (datetime.now().isoformat(), last_expense_date, count, last_updated_at))
+    
+    def get_last_updated_at(self) -> Optional[str]:
+        """
+        Get the updated_after cursor stored by the last completed sync.
+        None means no sync has completed yet, so the next one fetches fully.
+        """
+        conn = self._get_connection()
+        row = conn.execute('SELECT last_updated_at FROM sync_meta WHERE id = 1').fetchone()
+        return row[0] if row else None
     
     def get_sync_status(self) -> Dict:
         """Get sync status information"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        # Get sync meta
-        cursor.execute('SELECT * FROM sync_meta WHERE id = 1')
-        sync_meta = dict(cursor.fetchone())
-        
-        # Get expense count
-        cursor.execute('SELECT COUNT(*) as count FROM expenses WHERE deleted_at IS NULL')
-        sync_meta['expense_count'] = cursor.fetchone()['count']
-        
-        conn.close()
-        return sync_meta
+        # Sync meta and the live expense count in one statement
+        cursor.execute(_SYNC_STATUS_SQL)
+        return dict(cursor.fetchone())
     
     def cache_category(self, description: str, category: str):
         """Cache category for a description"""
-        import hashlib
-        desc_hash = hashlib.md5(description.lower().strip().encode()).hexdigest()
+        desc_hash = _description_hash(_description_key(description))
         
         conn = self._get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO category_cache (description_hash, description, category, created_at)
-                VALUES (?, ?, ?, ?)
-            ''', (desc_hash, description, category, datetime.now().isoformat()))
-            conn.commit()
+            with conn:
+                conn.execute(_CACHE_CATEGORY_SQL, (desc_hash, description, category, datetime.now().isoformat()))
         except Exception:
             pass
-        conn.close()
+        _get_cached_category.cache_clear()
     
     def get_cached_category(self, description: str) -> Optional[str]:
         """Get cached category for a description"""
-        import hashlib
-        desc_hash = hashlib.md5(description.lower().strip().encode()).hexdigest()
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT category FROM category_cache WHERE description_hash = ?', (desc_hash,))
-        row = cursor.fetchone()
-        conn.close()
-        return row['category'] if row else None
+        return _get_cached_category(self.db_path, _description_key(description))
 
     def delete_expense(self, expense_id: int) -> bool:
         """Soft delete an expense"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE expenses SET deleted_at = ? WHERE id = ?
-        ''', (datetime.now().isoformat(), expense_id))
+        with conn:
+            cursor = conn.execute('''
+                UPDATE expenses SET deleted_at = ? WHERE id = ?
+            ''', (datetime.now().isoformat(), expense_id))
         
-        row_count = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return row_count > 0
+        return cursor.rowcount > 0
 
     def update_expense_category(self, expense_id: int, category: str) -> bool:
         """Update category for an expense (by local ID)"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE expenses SET ai_category = ? WHERE id = ?
-        ''', (category, expense_id))
+        with conn:
+            cursor = conn.execute('''
+                UPDATE expenses SET ai_category = ? WHERE id = ?
+            ''', (category, expense_id))
         
-        row_count = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return row_count > 0
+        return cursor.rowcount > 0
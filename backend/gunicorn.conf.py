@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for serving the backend outside the Flask dev server
+Run from anywhere with: gunicorn -c backend/gunicorn.conf.py
+"""
+
+import os
+
+# The app imports modules top-level and opens DATABASE_PATH relative to backend/
+chdir = os.path.dirname(os.path.abspath(__file__))
+# Config.DEBUG defaults to on (pretty-printed JSON, debug errors); not here
+wsgi_app = 'app:create_app(debug=False)'
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5000')
+
+# Requests mostly wait on Splitwise/Groq, so one process's threads overlap
+# that I/O; SQLite connections are per thread. The analytics memo and the
+# groups/friends and category caches live in each process and are only
+# invalidated by the process that wrote, so with more workers analytics
+# can be up to ANALYTICS_TTL_SECONDS (30s) stale after a sync elsewhere.
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+keepalive = 5
+
+# A first sync can page through thousands of expenses and LLM batches
+timeout = 300
+
+# Build the app (and run init_db's schema migrations) once in the master
+# instead of racing them in every worker; connections and API clients
+# are still created lazily after the fork
+preload_app = True
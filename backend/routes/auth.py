@@ -3,20 +3,78 @@ Auth API Routes
 Handles authentication status and user info
 """
 
-from flask import Blueprint, jsonify
+import hashlib
+import threading
+import time
+from flask import Blueprint, current_app, jsonify, request
 from splitwise_api.client import SplitwiseClient
 from config import Config
 
 auth_bp = Blueprint('auth', __name__)
 
+# Building a client calls getCurrentUser() over the network, so one client
+# (and with it the authentication check) is shared per API key for a while
+CLIENT_TTL_SECONDS = 60
+_clients = {}  # api_key -> (expires_at, client)
+_cache_lock = threading.Lock()
+
 
 def get_splitwise_client() -> SplitwiseClient:
-    """Get Splitwise client instance"""
-    return SplitwiseClient(
+    """Get Splitwise client instance; authenticated ones are reused for CLIENT_TTL_SECONDS"""
+    api_key = Config.SPLITWISE_API_KEY
+    with _cache_lock:
+        cached = _clients.get(api_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    sw_client = SplitwiseClient(
         consumer_key=Config.SPLITWISE_CONSUMER_KEY,
         consumer_secret=Config.SPLITWISE_CONSUMER_SECRET,
-        api_key=Config.SPLITWISE_API_KEY
+        api_key=api_key
     )
+    # A failed getCurrentUser() may be transient; don't pin it for the TTL
+    if sw_client.is_authenticated():
+        with _cache_lock:
+            _clients[api_key] = (time.monotonic() + CLIENT_TTL_SECONDS, sw_client)
+    return sw_client
+
+
+# Groups and friends rarely change, so their serialized responses are served
+# from memory for RESPONSE_TTL_SECONDS instead of hitting the Splitwise API
+# each time. Each body carries an ETag so repeat polls can get a 304.
+RESPONSE_TTL_SECONDS = 300
+_responses = {}  # (name, api_key) -> (expires_at, (body, etag))
+
+
+def _get_cached_response(name: str):
+    """Get a cached (body, etag) pair, or None if missing/expired"""
+    with _cache_lock:
+        cached = _responses.get((name, Config.SPLITWISE_API_KEY))
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _cache_response(name: str, data) -> tuple:
+    """Serialize a payload once and cache it for RESPONSE_TTL_SECONDS"""
+    body = jsonify({'success': True, name: data}).get_data()
+    entry = (body, hashlib.sha1(body).hexdigest())
+    with _cache_lock:
+        _responses[(name, Config.SPLITWISE_API_KEY)] = (time.monotonic() + RESPONSE_TTL_SECONDS, entry)
+    return entry
+
+
+def invalidate_cached_response(name: str):
+    """Drop a cached response, e.g. friends after a sync changes balances"""
+    with _cache_lock:
+        _responses.pop((name, Config.SPLITWISE_API_KEY), None)
+
+
+def _etag_response(body: bytes, etag: str):
+    """Send a cached body with its ETag, or 304 if the client already has it"""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @auth_bp.route('/status', methods=['GET'])
@@ -48,20 +106,19 @@ def auth_status():
 def get_groups():
     """Get user's Splitwise groups"""
     try:
-        sw_client = get_splitwise_client()
+        cached = _get_cached_response('groups')
+        if cached is None:
+            sw_client = get_splitwise_client()
+            
+            if not sw_client.is_authenticated():
+                return jsonify({
+                    'success': False,
+                    'error': 'Not authenticated'
+                }), 401
+            
+            cached = _cache_response('groups', sw_client.get_groups())
         
-        if not sw_client.is_authenticated():
-            return jsonify({
-                'success': False,
-                'error': 'Not authenticated'
-            }), 401
-        
-        groups = sw_client.get_groups()
-        
-        return jsonify({
-            'success': True,
-            'groups': groups
-        })
+        return _etag_response(*cached)
         
     except Exception as e:
         return jsonify({
@@ -74,20 +131,19 @@ def get_groups():
 def get_friends():
     """Get user's Splitwise friends"""
     try:
-        sw_client = get_splitwise_client()
+        cached = _get_cached_response('friends')
+        if cached is None:
+            sw_client = get_splitwise_client()
+            
+            if not sw_client.is_authenticated():
+                return jsonify({
+                    'success': False,
+                    'error': 'Not authenticated'
+                }), 401
+            
+            cached = _cache_response('friends', sw_client.get_friends())
         
-        if not sw_client.is_authenticated():
-            return jsonify({
-                'success': False,
-                'error': 'Not authenticated'
-            }), 401
-        
-        friends = sw_client.get_friends()
-        
-        return jsonify({
-            'success': True,
-            'friends': friends
-        })
+        return _etag_response(*cached)
         
     except Exception as e:
         return jsonify({
@@ -3,40 +3,105 @@ Expense API Routes
 Handles expense CRUD, analytics, and sync operations
 """
 
-from flask import Blueprint, request, jsonify, current_app
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from flask import Blueprint, request, jsonify, current_app, g
 from database.db_manager import DatabaseManager
-from splitwise_api.client import SplitwiseClient
 from categorizer.groq_llm import GroqCategorizer
-from config import Config
+from routes.auth import get_splitwise_client, invalidate_cached_response  # shared, TTL-cached client
 
 expenses_bp = Blueprint('expenses', __name__)
 
+# Fetched expenses are written to the database in chunks of this many
+SYNC_CHUNK_SIZE = 500
+
+# The updated_after cursor is stored this far before the sync's start, so
+# clock skew with Splitwise cannot hide changes made while it ran
+SYNC_CURSOR_OVERLAP = timedelta(minutes=5)
+
+# Fixed /data/<id> replies, serialized once per app by its JSON provider
+# (so the bytes match jsonify); each request still gets its own Response
+# object since after_request hooks (CORS) modify headers
+_STATIC_REPLIES = {
+    'deleted': {'success': True, 'message': 'Expense deleted successfully'},
+    'category_updated': {'success': True, 'message': 'Category updated successfully'},
+    'category_required': {'success': False, 'error': 'Category is required'},
+    'not_found': {'success': False, 'error': 'Expense not found'},
+}
+
+
+def static_json_response(name: str, status: int = 200):
+    """Send one of _STATIC_REPLIES, serializing it on first use"""
+    bodies = current_app.extensions.setdefault('static_json_bodies', {})
+    body = bodies.get(name)
+    if body is None:
+        body = bodies[name] = jsonify(_STATIC_REPLIES[name]).get_data()
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
 
 def get_db_manager() -> DatabaseManager:
-    """Get database manager instance"""
-    db_path = current_app.config.get('DATABASE_PATH', 'splitwise_data.db')
-    return DatabaseManager(db_path)
+    """Get database manager instance for the current request"""
+    if 'db_manager' not in g:
+        db_path = current_app.config.get('DATABASE_PATH', 'splitwise_data.db')
+        g.db_manager = DatabaseManager(db_path)
+    return g.db_manager
 
 
-def get_splitwise_client() -> SplitwiseClient:
-    """Get Splitwise client instance"""
-    return SplitwiseClient(
-        consumer_key=Config.SPLITWISE_CONSUMER_KEY,
-        consumer_secret=Config.SPLITWISE_CONSUMER_SECRET,
-        api_key=Config.SPLITWISE_API_KEY
-    )
+_categorizer_lock = threading.Lock()
 
 
 def get_categorizer() -> GroqCategorizer:
-    """Get Groq LLM categorizer instance (pure LLM, no keywords)"""
-    return GroqCategorizer()
+    """Get Groq LLM categorizer instance (pure LLM, no keywords), one per app"""
+    categorizer = current_app.extensions.get('categorizer')
+    if categorizer is None:
+        # Threaded servers may ask concurrently; build the client only once
+        with _categorizer_lock:
+            categorizer = current_app.extensions.get('categorizer')
+            if categorizer is None:
+                categorizer = current_app.extensions['categorizer'] = GroqCategorizer()
+    return categorizer
+
+
+# Analytics only change when expenses are written, so their query results
+# are served from memory for ANALYTICS_TTL_SECONDS, keyed by the request's
+# filter params. Write endpoints drop the whole cache (invalidate_analytics).
+ANALYTICS_TTL_SECONDS = 30
+ANALYTICS_CACHE_MAX = 256
+_analytics = {}  # (name, db_path, args) -> (expires_at, data)
+_analytics_lock = threading.Lock()
+
+
+def memoized_analytics(name: str, compute, *args):
+    """Return compute(*args), reusing a result cached for ANALYTICS_TTL_SECONDS"""
+    key = (name, current_app.config.get('DATABASE_PATH', 'splitwise_data.db'), args)
+    with _analytics_lock:
+        cached = _analytics.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    data = compute(*args)
+    with _analytics_lock:
+        if len(_analytics) >= ANALYTICS_CACHE_MAX:
+            _analytics.clear()
+        _analytics[key] = (time.monotonic() + ANALYTICS_TTL_SECONDS, data)
+    return data
+
+
+def invalidate_analytics():
+    """Drop all memoized analytics after expenses or categories change"""
+    with _analytics_lock:
+        _analytics.clear()
 
 
 @expenses_bp.route('/sync', methods=['POST'])
 def sync_expenses():
     """
     Sync new expenses from Splitwise.
-    Only fetches expenses not already in local database.
+    The first sync fetches everything not already in the local database;
+    later syncs fetch only expenses updated since the last one, unless
+    dated_after asks to re-fetch by expense date.
     """
     try:
         db = get_db_manager()
@@ -52,49 +117,74 @@ def sync_expenses():
         data = request.get_json() or {}
         dated_after = data.get('dated_after')
 
-        # Get existing expense IDs
-        existing_ids = db.get_existing_expense_ids()
-        
-        # Fetch expenses (pass dated_after to allow re-fetch)
-        new_expenses = sw_client.fetch_all_expenses(
+        # Incremental syncs ask only for expenses changed since the cursor a
+        # completed sync stored. Without one (first sync, or the first one
+        # was interrupted) everything not stored yet is fetched, skipping
+        # known IDs; an explicit dated_after re-fetches by expense date.
+        updated_after = None if dated_after else db.get_last_updated_at()
+        full_fetch = not (dated_after or updated_after)
+        existing_ids = db.get_existing_expense_ids() if full_fetch else None
+        
+        # Changes made from now on are the next sync's job. A dated_after
+        # sync covers only part of the history, so it sets no cursor.
+        next_cursor = None
+        if not dated_after:
+            next_cursor = (datetime.now(timezone.utc) - SYNC_CURSOR_OVERLAP).strftime('%Y-%m-%dT%H:%M:%SZ')
+        
+        # Fetch expenses (pass dated_after to allow re-fetch) and insert them
+        # chunk by chunk as pages arrive, rather than holding them all
+        rows = sw_client.iter_expenses(
             existing_ids=existing_ids, 
-            dated_after=dated_after
+            dated_after=dated_after,
+            updated_after=updated_after
         )
-        
-        if not new_expenses:
+        synced_ids = []
+        last_date = None
+        inserted = 0
+        while True:
+            chunk = list(islice(rows, SYNC_CHUNK_SIZE))
+            if not chunk:
+                break
+            if last_date is None:
+                last_date = chunk[0].date
+            synced_ids.extend(e.splitwise_id for e in chunk)
+            inserted += db.insert_expenses(chunk)
+        
+        # Categorize ONLY the synced expenses that still need it; the DB
+        # already knows which of them are payments, deleted or categorized
+        expenses_to_categorize = db.get_uncategorized_expenses_by_ids(synced_ids) if synced_ids else []
+        
+        categorized_count = 0
+        if expenses_to_categorize:
+            categorizer = get_categorizer()
+            # Without an API key every expense would come back 'Other'; leave
+            # them uncategorized so a later /recategorize picks them up
+            if categorizer.is_configured():
+                categories = categorizer.categorize_batch(expenses_to_categorize)
+                db.bulk_update_categories(categories)
+                categorized_count = len(categories)
+        
+        # Update sync metadata; the cursor is only stored once the whole
+        # fetch has gone through
+        db.update_sync_meta(last_expense_date=last_date, count=inserted, last_updated_at=next_cursor)
+        invalidate_analytics()
+        # Friend balances move with synced expenses
+        invalidate_cached_response('friends')
+        
+        if not synced_ids:
             return jsonify({
                 'success': True,
                 'message': 'No new expenses to sync',
                 'synced_count': 0,
-                'total_count': len(existing_ids)
+                'total_count': db.get_expense_count()
             })
         
-        # Insert new expenses
-        inserted = db.insert_expenses(new_expenses)
-        
-        # Get uncategorized expenses and categorize them
-        # Categorize ONLY the new expenses
-        expenses_to_categorize = [
-            {'splitwise_id': e['id'], 'description': e['description']}
-            for e in new_expenses 
-            if e.get('payment') is False and e.get('deleted_at') is None
-        ]
-        
-        if expenses_to_categorize:
-            categorizer = get_categorizer()
-            categories = categorizer.categorize_batch(expenses_to_categorize)
-            db.bulk_update_categories(categories)
-        
-        # Update sync metadata
-        last_date = new_expenses[0]['date'] if new_expenses else None
-        db.update_sync_meta(last_expense_date=last_date, count=inserted)
-        
         return jsonify({
             'success': True,
             'message': f'Synced {inserted} new expenses',
             'synced_count': inserted,
-            'categorized_count': len(expenses_to_categorize),
-            'total_count': len(existing_ids) + inserted
+            'categorized_count': categorized_count,
+            'total_count': db.get_expense_count()
         })
         
     except Exception as e:
@@ -114,7 +204,10 @@ def get_expenses():
             'start_date': request.args.get('start_date'),
             'end_date': request.args.get('end_date'),
             'category': request.args.get('category'),
-            'group_id': request.args.get('group_id')
+            'group_id': request.args.get('group_id'),
+            # Paging values that are not integers are ignored
+            'limit': request.args.get('limit', type=int),
+            'offset': request.args.get('offset', type=int)
         }
         
         # Remove None values
@@ -141,7 +234,7 @@ def get_monthly_analytics():
     try:
         db = get_db_manager()
         year = request.args.get('year')
-        monthly_data = db.get_monthly_analytics(year=year)
+        monthly_data = memoized_analytics('monthly', db.get_monthly_analytics, year)
         
         return jsonify({
             'success': True,
@@ -160,7 +253,7 @@ def get_yearly_analytics():
     """Get yearly expense breakdown"""
     try:
         db = get_db_manager()
-        yearly_data = db.get_yearly_analytics()
+        yearly_data = memoized_analytics('yearly', db.get_yearly_analytics)
         
         return jsonify({
             'success': True,
@@ -183,7 +276,7 @@ def get_category_breakdown():
         year = request.args.get('year')
         month = request.args.get('month')
         
-        categories = db.get_category_breakdown(year=year, month=month)
+        categories = memoized_analytics('categories', db.get_category_breakdown, year, month)
         
         return jsonify({
             'success': True,
@@ -202,7 +295,7 @@ def get_sync_status():
     """Get sync status information"""
     try:
         db = get_db_manager()
-        status = db.get_sync_status()
+        status = memoized_analytics('sync_status', db.get_sync_status)
         
         return jsonify({
             'success': True,
@@ -236,7 +329,9 @@ def recategorize_expenses():
         
         if force:
             # Get ALL expenses for recategorization (with optional filters)
-            all_expenses = db.get_all_expenses(filters if filters else None)
+            all_expenses = db.get_all_expenses(
+                filters if filters else None, fields=('splitwise_id', 'description')
+            )
             expenses_to_categorize = [
                 {'splitwise_id': e['splitwise_id'], 'description': e['description']}
                 for e in all_expenses
@@ -254,6 +349,7 @@ def recategorize_expenses():
         
         categories = categorizer.categorize_batch(expenses_to_categorize)
         db.bulk_update_categories(categories)
+        invalidate_analytics()
         
         return jsonify({
             'success': True,
@@ -274,33 +370,9 @@ def get_dashboard_data():
     try:
         db = get_db_manager()
         
-        # Get all data
-        monthly = db.get_monthly_analytics()
-        yearly = db.get_yearly_analytics()
-        categories = db.get_category_breakdown()
-        
-        # Get recent expenses (last 10)
-        all_expenses = db.get_all_expenses()
-        recent = all_expenses[:10] if all_expenses else []
-        
-        # Calculate totals
-        total_expenses = sum(e['user_share'] for e in all_expenses)
-        expense_count = len(all_expenses)
-        
-        # Get sync status
-        sync_status = db.get_sync_status()
-        
         return jsonify({
             'success': True,
-            'dashboard': {
-                'total_expenses': total_expenses,
-                'expense_count': expense_count,
-                'monthly': monthly,
-                'yearly': yearly,
-                'categories': categories,
-                'recent_expenses': recent,
-                'sync_status': sync_status
-            }
+            'dashboard': memoized_analytics('dashboard', db.get_dashboard_bundle)
         })
         
     except Exception as e:
@@ -318,15 +390,10 @@ def delete_expense(expense_id):
         success = db.delete_expense(expense_id)
         
         if success:
-            return jsonify({
-                'success': True,
-                'message': 'Expense deleted successfully'
-            })
+            invalidate_analytics()
+            return static_json_response('deleted')
         else:
-            return jsonify({
-                'success': False,
-                'error': 'Expense not found'
-            }), 404
+            return static_json_response('not_found', 404)
             
     except Exception as e:
         return jsonify({
@@ -343,24 +410,16 @@ def update_expense_category(expense_id):
         category = data.get('category')
         
         if not category:
-            return jsonify({
-                'success': False,
-                'error': 'Category is required'
-            }), 400
+            return static_json_response('category_required', 400)
             
         db = get_db_manager()
         success = db.update_expense_category(expense_id, category)
         
         if success:
-            return jsonify({
-                'success': True,
-                'message': 'Category updated successfully'
-            })
+            invalidate_analytics()
+            return static_json_response('category_updated')
         else:
-            return jsonify({
-                'success': False,
-                'error': 'Expense not found'
-            }), 404
+            return static_json_response('not_found', 404)
             
     except Exception as e:
         return jsonify({
@@ -405,14 +464,14 @@ def test_gemini_categorization():
             for i, desc in enumerate(sample_descriptions)
         ]
         
-        # Force API call (skip local fallback)
-        results = categorizer._categorize_with_api(mock_expenses)
+        # Force API call (the categorizer is pure LLM, no local fallback)
+        results = categorizer.categorize_batch(mock_expenses)
         
         # Format results
+        result_by_id = {r.get('splitwise_id'): r for r in results if r}
         formatted = []
         for i, desc in enumerate(sample_descriptions):
-            result = next((r for r in results if r.get('splitwise_id') == i), None)
-            category = result['category'] if result else 'Unknown'
+            category = result_by_id.get(i, {}).get('category', 'Unknown')
             formatted.append({
                 'description': desc,
                 'category': category
@@ -4,14 +4,59 @@ Fetches expenses using API key (no OAuth required for local use)
 """
 
 from splitwise import Splitwise
-from typing import List, Dict, Optional, Set
+from requests import Request, Session
+from typing import List, Dict, Optional, Set, Iterator
 from datetime import datetime
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+
+
+# One fetched expense. Fields are in the order DatabaseManager.insert_expenses
+# binds them, so rows go to the database without a dict -> tuple step.
+ExpenseRow = namedtuple('ExpenseRow', [
+    'splitwise_id', 'description', 'amount', 'currency', 'date',
+    'created_at', 'updated_at', 'deleted_at', 'group_id', 'group_name',
+    'category', 'payer_id', 'payer_name', 'user_share', 'is_payment'
+])
+
+
+class _PooledSplitwise(Splitwise):
+    """
+    Splitwise SDK client that keeps one keep-alive HTTP session per thread.
+    The SDK opens (and closes) a new session for every call, paying a TCP
+    and TLS handshake per expense page; this overrides its private request
+    hook to reuse the connection instead. The hook and the private helpers
+    it calls match splitwise 3.0.0 (the minimum in requirements.txt).
+    """
+    
+    _sessions = threading.local()
+    
+    def _Splitwise__makeRequest(self, url, method="GET", data=None, auth=None, files=None):
+        headers = {}
+        if auth is None:
+            if self.auth:
+                auth = self.auth
+            elif self.api_key:
+                headers = {'Authorization': 'Bearer {}'.format(self.api_key)}
+        
+        data = Splitwise._Splitwise__handleUppercaseBoolean(data)
+        prep_req = Request(method=method, url=url, headers=headers, data=data, auth=auth, files=files).prepare()
+        
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = Session()
+        return self._Splitwise__handleResponse(session.send(prep_req))
 
 
 class SplitwiseClient:
     """Client for interacting with Splitwise API"""
     
+    # Most expense pages requested ahead of the one being processed. HTTP
+    # sessions are per thread, so concurrent fetches are safe.
+    PREFETCH_PAGES = 4
+    
     def __init__(self, consumer_key: str, consumer_secret: str, api_key: str = None):
         """Initialize Splitwise client with API credentials"""
         self.consumer_key = consumer_key
@@ -23,7 +68,7 @@ class SplitwiseClient:
     
     def _initialize_client(self):
         """Initialize the Splitwise SDK client"""
-        self.client = Splitwise(self.consumer_key, self.consumer_secret, api_key=self.api_key)
+        self.client = _PooledSplitwise(self.consumer_key, self.consumer_secret, api_key=self.api_key)
         try:
             self.current_user = self.client.getCurrentUser()
         except Exception as e:
@@ -60,127 +105,155 @@ class SplitwiseClient:
     def fetch_all_expenses(
         self,
         existing_ids: Set[int] = None,
-        limit_per_request: int = 100,
+        limit_per_request: int = 500,
         max_expenses: int = None,
-        dated_after: str = None
-    ) -> List[Dict]:
+        dated_after: str = None,
+        updated_after: str = None
+    ) -> List[ExpenseRow]:
+        """Fetch all expenses the user is involved in as a list (see iter_expenses)"""
+        return list(self.iter_expenses(existing_ids, limit_per_request, max_expenses, dated_after, updated_after))
+    
+    def iter_expenses(
+        self,
+        existing_ids: Set[int] = None,
+        limit_per_request: int = 500,
+        max_expenses: int = None,
+        dated_after: str = None,
+        updated_after: str = None
+    ) -> Iterator[ExpenseRow]:
         """
-        Fetch all expenses the user is involved in.
-        Skips expenses that already exist in the provided set of IDs (unless dated_after is set, 
-        in which case allow re-fetching to update local data).
+        Yield all expenses the user is involved in, page by page as they
+        arrive, so callers can store them without holding the whole list.
+        Skips expenses that already exist in the provided set of IDs (unless dated_after or
+        updated_after is set, in which case allow re-fetching to update local data).
         
         Args:
             existing_ids: Set of Splitwise expense IDs already in local DB
             limit_per_request: Number of expenses to fetch per API call
             max_expenses: Maximum total expenses to fetch (None for all)
             dated_after: ISO date string (YYYY-MM-DD) to fetch expenses after
+            updated_after: ISO timestamp; fetch only expenses changed after it
         
-        Returns:
-            List of expense dictionaries (new or updated expenses)
+        Yields:
+            ExpenseRow tuples (new or updated expenses)
         """
-        if existing_ids is None:
-            existing_ids = set()
+        # Skip known IDs unless dated_after/updated_after asks to re-fetch
+        # them (to update/undelete); decided once here instead of per expense
+        existing_ids = frozenset(existing_ids or ())
+        skip_existing = bool(existing_ids) and not (dated_after or updated_after)
         
-        all_expenses = []
+        yielded = 0
         offset = 0
         user_id = self.current_user.getId() if self.current_user else None
+        if not user_id:
+            return  # no share can be attributed to an unknown user
         
-        # Build group name lookup
-        groups = {g.getId(): g.getName() for g in self.client.getGroups()}
+        # Fallbacks for expenses missing dates, computed once per sync
+        today = datetime.now().strftime('%Y-%m-%d')
+        now = datetime.now().isoformat()
         
-        while True:
-            # Fetch batch of expenses
-            expenses = self.client.getExpenses(offset=offset, limit=limit_per_request, dated_after=dated_after)
-            
-            if not expenses:
-                break
-            
-            for expense in expenses:
-                expense_id = expense.getId()
-                
-                # Skip if already in local DB AND we keep old behavior (no dated_after)
-                # If dated_after is provided, we want to re-fetch even if ID exists (to update/undelete)
-                if existing_ids and expense_id in existing_ids and not dated_after:
-                   continue
-                
-                # Skip deleted expenses
-                if expense.getDeletedAt():
-                    continue
-                
-                # Get user's share from this expense
-                user_share = self._get_user_share(expense, user_id)
-                
-                # Skip if user has no share
-                if user_share == 0:
-                    continue
-                
-                # Get payer info
-                payer_id, payer_name = self._get_payer_info(expense)
+        # Build group name lookup; unknown groups fall back to one shared name
+        groups = defaultdict(
+            lambda: 'Non-group expense',
+            ((g.getId(), g.getName()) for g in self.client.getGroups())
+        )
+        
+        def fetch_page(page_offset: int):
+            return self.client.getExpenses(
+                offset=page_offset, limit=limit_per_request,
+                dated_after=dated_after, updated_after=updated_after
+            )
+        
+        # Keep a sliding window of page requests in flight and consume them
+        # in offset order, so sync time is no longer pages x round-trip.
+        # Page 0 goes alone (an incremental sync rarely needs more) and the
+        # window grows by a page for every full page, up to PREFETCH_PAGES,
+        # so short syncs don't spend rate limit on pages past the end.
+        pool = ThreadPoolExecutor(max_workers=self.PREFETCH_PAGES)
+        pending = deque([pool.submit(fetch_page, offset)])
+        offset += limit_per_request
+        window = 0
+        
+        try:
+            while pending:
+                # Fetch batch of expenses
+                expenses = pending.popleft().result()
                 
-                # Get group name
-                group_id = expense.getGroupId()
-                group_name = groups.get(group_id, 'Non-group expense')
+                if not expenses:
+                    break
                 
-                expense_data = {
-                    'splitwise_id': expense_id,
-                    'description': expense.getDescription() or 'No description',
-                    'amount': float(expense.getCost() or 0),
-                    'currency': expense.getCurrencyCode() or 'INR',
-                    'date': expense.getDate()[:10] if expense.getDate() else datetime.now().strftime('%Y-%m-%d'),
-                    'created_at': expense.getCreatedAt() or datetime.now().isoformat(),
-                    'updated_at': expense.getUpdatedAt(),
-                    'deleted_at': expense.getDeletedAt(),
-                    'group_id': group_id,
-                    'group_name': group_name,
-                    'category': self._get_category(expense),
-                    'payer_id': payer_id,
-                    'payer_name': payer_name,
-                    'user_share': user_share,
-                    'is_payment': 1 if expense.getPayment() else 0
-                }
+                # A full page means there may be more: widen and refill the window
+                if len(expenses) >= limit_per_request:
+                    window = min(window + 1, self.PREFETCH_PAGES)
+                    while len(pending) < window:
+                        pending.append(pool.submit(fetch_page, offset))
+                        offset += limit_per_request
                 
-                all_expenses.append(expense_data)
+                for expense in expenses:
+                    expense_id = expense.getId()
+                    
+                    # Skip if already in local DB (unless re-fetching, see skip_existing)
+                    if skip_existing and expense_id in existing_ids:
+                        continue
+                    
+                    # Skip deleted expenses
+                    if expense.getDeletedAt():
+                        continue
+                    
+                    # Get user's share and payer info in one pass over the
+                    # expense's users (inlined: this loop runs per expense)
+                    user_share = None
+                    payer_id = payer_name = None
+                    for user in expense.getUsers():
+                        if user_share is None and user.getId() == user_id:
+                            user_share = float(user.getOwedShare() or 0)
+                        if payer_id is None and float(user.getPaidShare() or 0) > 0:
+                            payer_id, payer_name = user.getId(), user.getFirstName()
+                        if user_share is not None and payer_id is not None:
+                            break
+                    
+                    # Skip if user has no share
+                    if not user_share:
+                        continue
+                    
+                    category = expense.getCategory()
+                    expense_date = expense.getDate()
+                    
+                    # Get group name
+                    group_id = expense.getGroupId()
+                    group_name = groups[group_id]
+                    
+                    expense_data = ExpenseRow(
+                        splitwise_id=expense_id,
+                        description=expense.getDescription() or 'No description',
+                        amount=float(expense.getCost() or 0),
+                        currency=expense.getCurrencyCode() or 'INR',
+                        date=expense_date[:10] if expense_date else today,
+                        created_at=expense.getCreatedAt() or now,
+                        updated_at=expense.getUpdatedAt(),
+                        deleted_at=expense.getDeletedAt(),
+                        group_id=group_id,
+                        group_name=group_name,
+                        category=category.getName() if category else None,
+                        payer_id=payer_id,
+                        payer_name=payer_name,
+                        user_share=user_share,
+                        is_payment=1 if expense.getPayment() else 0
+                    )
+                    
+                    yield expense_data
+                    yielded += 1
+                    
+                    # Check if we've reached max
+                    if max_expenses and yielded >= max_expenses:
+                        return
                 
-                # Check if we've reached max
-                if max_expenses and len(all_expenses) >= max_expenses:
-                    return all_expenses
-            
-            # Move to next batch
-            offset += limit_per_request
-            
-            # If we got fewer than requested, we've reached the end
-            if len(expenses) < limit_per_request:
-                break
-        
-        return all_expenses
-    
-    def _get_user_share(self, expense, user_id: int) -> float:
-        """Get the current user's share from an expense"""
-        if not user_id:
-            return 0
-        
-        users = expense.getUsers()
-        for user in users:
-            if user.getId() == user_id:
-                owed = float(user.getOwedShare() or 0)
-                return owed
-        return 0
-    
-    def _get_payer_info(self, expense) -> tuple:
-        """Get the payer's ID and name from an expense"""
-        users = expense.getUsers()
-        for user in users:
-            paid = float(user.getPaidShare() or 0)
-            if paid > 0:
-                return user.getId(), user.getFirstName()
-        return None, None
-    
-    def _get_category(self, expense) -> Optional[str]:
-        """Get the category from an expense"""
-        category = expense.getCategory()
-        if category:
-            return category.getName()
-        return None
+                # If we got fewer than requested, we've reached the end
+                if len(expenses) < limit_per_request:
+                    break
+        finally:
+            # Pages past the end (or past max_expenses) are not needed
+            pool.shutdown(wait=False, cancel_futures=True)
     
     def get_friends(self) -> List[Dict]:
         """Get list of friends with balances"""
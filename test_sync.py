@@ -0,0 +1,145 @@
+"""
+Sync cursor checks: /api/sync against a fake Splitwise SDK
+Run with: python -m pytest test_sync.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pytest
+
+from config import Config
+from splitwise_api.client import SplitwiseClient
+import routes.expenses as expenses_routes
+
+USER_ID = 1
+TOTAL_EXPENSES = 1234
+
+
+class FakeUser:
+    def __init__(self, user_id, owed, paid):
+        self.user_id, self.owed, self.paid = user_id, owed, paid
+    def getId(self): return self.user_id
+    def getOwedShare(self): return self.owed
+    def getPaidShare(self): return self.paid
+    def getFirstName(self): return f'User {self.user_id}'
+
+
+class FakeExpense:
+    def __init__(self, expense_id):
+        self.expense_id = expense_id
+    def getId(self): return self.expense_id
+    def getDeletedAt(self): return None
+    def getUsers(self): return [FakeUser(USER_ID, '5.0', '0'), FakeUser(2, '5.0', '10.0')]
+    def getGroupId(self): return 0
+    def getDescription(self): return f'Expense {self.expense_id}'
+    def getCost(self): return '10.0'
+    def getCurrencyCode(self): return 'INR'
+    def getDate(self): return '2024-01-01T00:00:00Z'
+    def getCreatedAt(self): return '2024-01-01T00:00:00Z'
+    def getUpdatedAt(self): return '2024-01-01T00:00:00Z'
+    def getCategory(self): return None
+    def getPayment(self): return False
+
+
+class FakeSplitwise:
+    """Serves TOTAL_EXPENSES expenses by offset; can fail once at a given offset"""
+
+    def __init__(self):
+        self.expenses = [FakeExpense(i) for i in range(1, TOTAL_EXPENSES + 1)]
+        self.calls = []
+        self.fail_at_offset = None
+
+    def getGroups(self):
+        return []
+
+    def getExpenses(self, offset=None, limit=None, dated_after=None, updated_after=None):
+        self.calls.append({'offset': offset, 'dated_after': dated_after, 'updated_after': updated_after})
+        if offset == self.fail_at_offset:
+            self.fail_at_offset = None
+            raise RuntimeError('429 Too Many Requests')
+        if updated_after:
+            return []  # nothing changed since the cursor
+        return self.expenses[offset:offset + limit]
+
+
+class NoCategorizer:
+    def is_configured(self):
+        return False
+    def categorize_batch(self, expenses):
+        return []
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    from app import create_app
+    app = create_app()
+
+    sw_client = SplitwiseClient.__new__(SplitwiseClient)
+    sw_client.client = FakeSplitwise()
+    sw_client.current_user = FakeUser(USER_ID, 0, 0)
+    monkeypatch.setattr(expenses_routes, 'get_splitwise_client', lambda: sw_client)
+    monkeypatch.setattr(expenses_routes, 'get_categorizer', lambda: NoCategorizer())
+
+    client = app.test_client()
+    def run(**body):
+        sw_client.client.calls.clear()
+        return client.post('/api/sync', json=body)
+    run.sdk = sw_client.client
+    run.client = client
+    return run
+
+
+def test_interrupted_first_sync_is_completed_by_the_next(sync):
+    sync.sdk.fail_at_offset = 500
+    assert sync().status_code == 500
+
+    # No cursor was stored, so the next sync fetches everything again
+    response = sync().get_json()
+    assert all(call['updated_after'] is None for call in sync.sdk.calls)
+    assert response['synced_count'] == TOTAL_EXPENSES - 500
+    assert response['total_count'] == TOTAL_EXPENSES
+
+    status = sync.client.get('/api/sync-status').get_json()['status']
+    assert status['expense_count'] == TOTAL_EXPENSES
+
+
+def test_completed_sync_switches_to_updated_after(sync):
+    assert sync().get_json()['synced_count'] == TOTAL_EXPENSES
+
+    response = sync().get_json()
+    assert response['synced_count'] == 0
+    assert sync.sdk.calls and all(call['updated_after'] for call in sync.sdk.calls)
+    assert all(call['dated_after'] is None for call in sync.sdk.calls)
+
+
+def test_dated_after_refetches_by_date_and_keeps_cursor(sync):
+    sync()
+    status = sync.client.get('/api/sync-status').get_json()['status']
+
+    sync(dated_after='2024-01-01')
+    assert all(call['dated_after'] == '2024-01-01' and call['updated_after'] is None
+               for call in sync.sdk.calls)
+
+    # A dated_after sync covers only part of the history: no cursor from it
+    expenses_routes.invalidate_analytics()
+    after = sync.client.get('/api/sync-status').get_json()['status']
+    assert after['last_updated_at'] == status['last_updated_at']
+
+
+def test_dated_after_on_a_fresh_database_sets_no_cursor(sync):
+    sync(dated_after='2024-01-01')
+    sync()
+    assert all(call['updated_after'] is None for call in sync.sdk.calls)
+
+
+def test_sync_without_categorizer_leaves_expenses_uncategorized(sync):
+    response = sync().get_json()
+    assert response['categorized_count'] == 0
+
+    from database.db_manager import DatabaseManager
+    db = DatabaseManager(Config.DATABASE_PATH)
+    assert len(db.get_uncategorized_expenses()) == TOTAL_EXPENSES